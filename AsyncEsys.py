@@ -0,0 +1,321 @@
+"""
+asyncio API of the Esys driver, for orchestrators that control several benches from one event loop.
+
+    esys = AsyncEsys(config)
+    esys.Initialize()
+    await esys.SetParameter('AccRunningModeActivateSupress', 11)
+    await esys.UploadDataSets()
+    await esys.Close()
+
+AsyncEsys drives an Esys device: configuration, config files, datasets, checkpoints, artifact store,
+logs and transcripts are the ones of Esys, and the session state machine is EsysSession (awaited
+through ensureAsync/restoreAsync). Only the E-Sys commands differ: they run as asyncio subprocesses
+(see _Launcher.RunAsync). Cancelling a task kills the running E-Sys command with what it started
+and drops the ECU connection state, the next call reconnects on its own.
+"""
+import asyncio
+import time
+
+import Esys as _esys
+from Esys import Esys, SessionState, _cmdLine
+
+
+class AsyncEsys:
+    def __init__(self, config):
+        self._esys = Esys(config)
+        # one flow at a time per bench, like the E-Sys server itself
+        self._flowLock = asyncio.Lock()
+        # the awaitable counterparts of the Esys steps EsysSession asks for
+        self._steps = {
+            "_serverAlive": self._serverAlive,
+            "_startServer": self._startServer,
+            "_authenticate": self._authenticate,
+            "_openConnection": self._openConnection,
+            "Disconnect": self._disconnect,
+            "Close": self._close,
+        }
+
+    @property
+    def esys(self):
+        """
+        the driven Esys device, e.g. for its folders; don't run its flows while a flow is awaited
+        """
+        return self._esys
+
+    @property
+    def LOG_PATH(self):
+        return self._esys.LOG_PATH
+
+    def SetConfig(self, config=None):
+        """
+        method use to set/change configuration (local files only, no E-Sys command)
+        """
+        self._esys.SetConfig(config)
+
+    def Initialize(self):
+        """
+        method used to initialize all the files and configs (local files only, no E-Sys command)
+        """
+        self._esys.Initialize()
+
+    async def Open(self):
+        """
+        method that opens esys server
+        """
+        async with self._flowLock:
+            return await self._ensure(SessionState.OPEN)
+
+    async def Connect(self):
+        """
+        method that creates the connection and reads the SVT file from ECU
+        """
+        async with self._flowLock:
+            return await self._ensure(SessionState.OPEN | SessionState.CONNECTED)
+
+    async def Authenticate(self):
+        """
+        method use to authenticate via swl certificate
+        """
+        async with self._flowLock:
+            return await self._ensure(SessionState.OPEN | SessionState.AUTHENTICATED)
+
+    async def Disconnect(self):
+        """
+        method that removes the connection to ecu
+        """
+        async with self._flowLock:
+            return await self._disconnect()
+
+    async def Close(self):
+        """
+        method that removes the connection to ecu and closes esys server
+        """
+        async with self._flowLock:
+            return await self._close()
+
+    async def FlashPdx(self, pdx_path=None, close_server=True):
+        """
+        method used to flash full pdx
+        """
+        esys = self._esys
+        async with self._flowLock:
+            with esys._monitored("FlashPdx"):
+                if not await self._ensure(SessionState.READY):
+                    return False
+                if pdx_path and not esys._isImported:
+                    cmd = esys._esysCmd("-pdximport", pdx_path, "-project", esys._generateProjName(pdx_path))
+                    esys._isImported = await self._send(cmd)
+                    if not esys._isImported:
+                        return False
+
+                cmd = esys._esysCmd("-server", "-talexecution", esys._masterCfg, "-ignoreBATHAF")
+                result = await self._send(cmd)
+                if _esys.DEBUG:
+                    flashStatus = "completed" if result else "NOT completed"
+                    print(f'ECU flashing is {flashStatus}')
+                if close_server:
+                    result &= await self._close()
+                return result
+
+    async def UploadDataSets(self, check_modified=False):
+        """
+        method that flashes modified and signed NCD's
+        @check_modified: check's if any SetParameter was called from last ecu upload
+        """
+        esys = self._esys
+        async with self._flowLock:
+            if check_modified and esys._dataSetsUpToDate:
+                return True
+            result = True
+            with esys._monitored("UploadDataSets"):
+                if not await self._ensure(SessionState.READY):
+                    return False
+
+                if not esys._localDataSets:
+                    result &= await self._readDataSetsFromECU()
+                inputs, cmd = esys._prepareConversion()
+                if cmd:
+                    result &= esys._finishConversion(inputs, await self._send(cmd))
+                inputs, cmd = esys._prepareSigning()
+                if cmd:
+                    result &= esys._finishSigning(inputs, await self._send(cmd))
+
+                result &= await self._send(esys._esysCmd("-server", "-talexecution", esys._createTalEcuNcdConfig()))
+            if _esys.DEBUG:
+                dataStatus = "successfully" if result else "could NOT be"
+                print(f"Data codings files {dataStatus} flashed to ECU")
+            if result:
+                esys._dataSetsUpToDate = True
+            return result
+
+    async def GetParameter(self, name):
+        """
+        method used to read the parameter value from FWL file
+        """
+        async with self._flowLock:
+            if not self._esys._localDataSets:
+                await self._readDataSetsFromECU()
+            data, value, parmData, fwlFile = self._esys._findParameter(name)
+        if _esys.DEBUG:
+            print(f"Parameter '{name}' actual value:'{data} - {value}'")
+        return value
+
+    async def SetParameter(self, name, value):
+        """
+        method used to update the FWL files. Will NOT write the data to ECU
+        """
+        esys = self._esys
+        async with self._flowLock:
+            if not esys._localDataSets:
+                await self._readDataSetsFromECU()
+            parmData, parmValue, fwlContent, fwlFile = esys._findParameter(name)
+            esys._replaceParm(fwlContent, fwlFile, f"{name}:{parmData}[{str(value)}]\n")
+            esys._dataSetsUpToDate = False
+        if _esys.DEBUG:
+            print(f"Parameter '{name}' set to value:'{parmData} - {str(value)}'")
+        return True
+
+    # session steps (see EsysSession._ensureFlow) -----------------------
+    async def _ensure(self, state):
+        return await self._esys._session.ensureAsync(state, self._step)
+
+    async def _step(self, name):
+        return await self._steps[name]()
+
+    async def _serverAlive(self):
+        process = self._esys._serverProcess
+        if process is not None and process.poll() is None:
+            return True
+        result, log = await self._sendAndGetLog(self._esys._esysCmd("-server", "-check"))
+        return result and not "Server is not running" in log
+
+    async def _startServer(self):
+        """
+        method that starts the esys server and waits until it answers
+        """
+        esys = self._esys
+        cmd = esys._esysCmd("-startserver")
+        if esys._replayer:
+            # a replayed command sleeps for its recorded duration
+            await asyncio.to_thread(esys._startServerProcess, cmd)
+        else:
+            esys._serverProcess = esys._startServerProcess(cmd)
+        cmd = esys._esysCmd("-server", "-check")
+        for _ in range(40):
+            result, log = await self._sendAndGetLog(cmd)
+            if result and not "Server is not running" in log:
+                if _esys.DEBUG: print('Server is Online')
+                return True
+            await asyncio.sleep(0.1)
+        print('Server is Offline')
+        return False
+
+    async def _authenticate(self):
+        cmd = self._esys._esysCmd("-server", "-authenticationCoding", "-connection", "internet", "-useSwlSecCertificate")
+        return await self._send(cmd)
+
+    async def _openConnection(self):
+        esys = self._esys
+        if not await self._send(esys._esysCmd("-server", "-openconnection", esys._masterCfg)):
+            return False
+        return esys._finishSVTFile(await self._send(esys._prepareSVTFile()))
+
+    async def _disconnect(self):
+        esys = self._esys
+        if not esys._isConnected: return True
+        result = await self._send(esys._esysCmd("-server", "-closeconnection"))
+        if result:
+            esys._session.transition(esys._session.state & ~SessionState.CONNECTED, "-closeconnection")
+        return result
+
+    async def _close(self):
+        esys = self._esys
+        if not esys._isOpen: return True
+        result = await self._disconnect()
+        esys._session.transition(SessionState.CLOSED, "-stop")
+        result &= await self._send(esys._esysCmd("-server", "-stop"))
+        if esys._serverProcess:
+            print('Server is terminated.')
+        if not esys._replayer:
+            # stopping waits (up to seconds) for the server to exit
+            await asyncio.to_thread(esys._launcher.Stop, esys._serverProcess)
+        esys._serverProcess = None
+        return result
+
+    async def _readDataSetsFromECU(self, out_path=None):
+        """
+        method that reads data from ECU and stores NCD and FWL files in /NCD/datasets (or out_path)
+        """
+        esys = self._esys
+        out_path = out_path or esys.DATA_SETS_PATH
+        # only undo what this method opened, callers may still need the session
+        previousState = esys._session.state
+        if not await self._ensure(SessionState.OPEN | SessionState.CONNECTED):
+            await esys._session.restoreAsync(previousState, self._step)
+            return False
+        result = await self._send(esys._prepareReadDataSets(out_path))
+        await esys._session.restoreAsync(previousState, self._step)
+        return esys._finishReadDataSets(result)
+
+    # commands ----------------------------------------------------------
+    async def _run(self, cmd, stdout=None, capture=False):
+        """
+        method that runs one E-Sys command and returns (returncode, stdout, stderr)
+        """
+        esys = self._esys
+        if esys._replayer:
+            return await asyncio.to_thread(esys._replayer.execute, cmd)
+        start = time.time()
+        try:
+            returncode, out, err = await esys._launcher.RunAsync(cmd, stdout=stdout, capture=capture)
+        except asyncio.CancelledError:
+            # the command is killed, the server keeps running but the connection state is unknown now
+            esys._session.transition(esys._session.state & SessionState.OPEN, "cancelled")
+            raise
+        if esys._recorder:
+            esys._recorder.record(cmd, returncode, out, err, start, time.time() - start)
+        return returncode, out, err
+
+    async def _send(self, cmd, return_code=True):
+        """
+        method used to send a command over e-sys batch file (see Esys._sendBatchCmd)
+        """
+        esys = self._esys
+        cmdLine = _cmdLine(cmd)
+        if _esys.DEBUG:
+            print(f"----->> {cmdLine}")
+
+        if esys._replayer:
+            returncode, stdout, stderr = await self._run(cmd)
+            esys._log.Write(cmdLine, returncode, stdout)
+        else:
+            log = esys._log.Begin()
+            returncode = None
+            try:
+                # while recording, the output goes through a pipe into the log
+                capture = esys._recorder is not None
+                returncode, stdout, stderr = await self._run(cmd, stdout=log, capture=capture)
+                if capture:
+                    log.write(stdout + stderr)
+            finally:
+                esys._log.End(log, cmdLine, returncode)
+
+        result = returncode == 0 or not return_code
+        if result and "-server" in cmd:
+            # the server just answered, no need to verify it is alive
+            esys._session.markAlive()
+        return result
+
+    async def _sendAndGetLog(self, cmd):
+        """
+        method used to send a command over e-sys batch file and return its output
+        """
+        if _esys.DEBUG:
+            print(f"----->> {_cmdLine(cmd)}")
+        try:
+            returncode, stdout, stderr = await self._run(cmd, capture=True)
+        except OSError as e:
+            return False, str(e)
+        if returncode == 0:
+            return True, stdout.strip()
+        return False, stderr.strip()
@@ -1,14 +1,153 @@
-from tal.KeywordDrivenBase.Devices.Drivers import Factory
-from tal.KeywordDrivenBase.Core.ConfigManager import PROJECT_PATH
 import os
-import shutil, psutil
 import time, re
 import configparser
-from subprocess import Popen
-import subprocess
+import contextlib
+import enum
+import json
+from collections import deque
+from functools import cached_property
 
 DEBUG = False
 
+
+def _cmdLine(cmd):
+    """
+    returns the command line of an argument vector (for logs and debug output)
+    """
+    import subprocess
+    return subprocess.list2cmdline(cmd)
+
+
+class SessionState(enum.Flag):
+    """
+    states of the E-Sys server session; AUTHENTICATED and CONNECTED both require OPEN
+    """
+    CLOSED = 0
+    OPEN = enum.auto()
+    AUTHENTICATED = enum.auto()
+    CONNECTED = enum.auto()
+    READY = OPEN | AUTHENTICATED | CONNECTED
+
+
+class EsysSession:
+    """
+    state machine of the E-Sys server session.
+
+    ensure(state) issues only the E-Sys commands needed to reach the requested state and
+    every transition is recorded in 'history' as (timestamp, from, to, reason).
+
+    The decisions are made once, in _ensureFlow/_restoreFlow: they yield the name of the next
+    step ('_startServer', 'Close', ...) and get its result back. ensure/restore run the steps
+    on Esys, ensureAsync/restoreAsync await them on an async executor (see AsyncEsys).
+    """
+    # a successful check is trusted for this long (seconds) before the server is checked again
+    LIVENESS_TTL = 30.0
+    HISTORY_SIZE = 200
+
+    def __init__(self, esys):
+        self._esys = esys
+        self.state = SessionState.CLOSED
+        self.history = deque(maxlen=self.HISTORY_SIZE)
+        self._lastAlive = 0.0
+
+    def ensure(self, state):
+        """
+        method that brings the session into (at least) the requested state
+        """
+        return self._run(self._ensureFlow(state), lambda step: getattr(self._esys, step)())
+
+    def restore(self, state):
+        """
+        method that goes back to a previous (lower) state, e.g. after a flow that needed a connection
+        """
+        return self._run(self._restoreFlow(state), lambda step: getattr(self._esys, step)())
+
+    async def ensureAsync(self, state, execute):
+        """
+        method like ensure, the steps are awaited as execute(step name)
+        """
+        return await self._runAsync(self._ensureFlow(state), execute)
+
+    async def restoreAsync(self, state, execute):
+        """
+        method like restore, the steps are awaited as execute(step name)
+        """
+        return await self._runAsync(self._restoreFlow(state), execute)
+
+    def _ensureFlow(self, state):
+        if self.state & SessionState.OPEN and not self.recentlyAlive():
+            if (yield "_serverAlive"):
+                self.markAlive()
+            else:
+                self.transition(SessionState.CLOSED, "server no longer running")
+
+        if state and not self.state & SessionState.OPEN:
+            # do one retry in case of Server Offline
+            if not ((yield "_startServer") or (yield "_startServer")):
+                return False
+            self.transition(SessionState.OPEN, "-startserver")
+
+        if state & SessionState.AUTHENTICATED and not self.state & SessionState.AUTHENTICATED:
+            if not (yield "_authenticate"):
+                return False
+            self.transition(self.state | SessionState.AUTHENTICATED, "-authenticationCoding")
+
+        if state & SessionState.CONNECTED and not self.state & SessionState.CONNECTED:
+            if not (yield "_openConnection"):
+                return False
+            self.transition(self.state | SessionState.CONNECTED, "-openconnection")
+        return True
+
+    def _restoreFlow(self, state):
+        if not state & SessionState.OPEN:
+            return (yield "Close")
+        if not state & SessionState.CONNECTED:
+            return (yield "Disconnect")
+        return True
+
+    @staticmethod
+    def _run(flow, execute):
+        try:
+            step = next(flow)
+            while True:
+                step = flow.send(execute(step))
+        except StopIteration as stop:
+            return stop.value
+
+    @staticmethod
+    async def _runAsync(flow, execute):
+        try:
+            step = next(flow)
+            while True:
+                step = flow.send(await execute(step))
+        except StopIteration as stop:
+            return stop.value
+
+    def transition(self, state, reason):
+        """
+        method that records a state change
+        """
+        if not state & SessionState.OPEN:
+            state = SessionState.CLOSED
+        if state == self.state:
+            return
+        self.history.append((time.time(), self.state, state, reason))
+        if DEBUG:
+            print(f"Esys session: {self.state} -> {state} ({reason})")
+        self.state = state
+        if state & SessionState.OPEN:
+            self.markAlive()
+
+    def markAlive(self):
+        self._lastAlive = time.monotonic()
+
+    def recentlyAlive(self):
+        """
+        true while the last successful server answer is younger than LIVENESS_TTL
+        """
+        return time.monotonic() - self._lastAlive < self.LIVENESS_TTL
+
+
 class Esys:
     """
     Configuration example ('.._devices.cfg'):
@@ -27,46 +166,177 @@ class Esys:
         <PARM name='esysbatch' value='C:/EC-Apps/E-Sys/E-Sys.bat'/>
         <PARM name='logdir' value='Reports'/>
         <PARM name='configdir' value='Config/Devices/Esys'/>
-        <PARM name='server_shell' value='True'/>
       </TAL-DEVICE>
     """
     def __init__ (self, config):
-        self._isConnected = False
-        self._isOpen = False
-        self._isAuthenticated = False
+        self._session = EsysSession(self)
         self._isImported = False
         self._checkConfigValid(config)
         self._config = config
         self._localDataSets = self._config.get('localdatasets', 'False').lower() == 'true'
-        self._serverShell = self._config.get('server_shell', 'False').lower() == 'true'
         self._appPath = self._config['esysbatch']
-        self._rootFolder = Factory.CheckFolderExists(f"{str(PROJECT_PATH)}/{self._config['configdir']}", reverse_slash=True)
-        self._logFolder = Factory.CheckFolderExists(f"{str(PROJECT_PATH)}\\{self._config['logdir']}")
-        self.LOG_PATH = self._logFolder + "\\EsysLog.log"
-        self.configDir = f"{self._rootFolder}/config"
-        self._masterCfg = f"{self.configDir}/master.config"
-        self._fwlCfg = f"{self.configDir}/fwl.config"
-        self._ncdCfg = f"{self.configDir}/ncd.config"
-        self._talCfg = f"{self.configDir}/tal_ecu_ncd.config"
-        self.SVT = Factory.CheckFolderExists(f"{self._rootFolder}/svt", reverse_slash=True)
         self.TAL = None
-        self.TAL_PATH = Factory.CheckFolderExists(f"{self._rootFolder}/tal", reverse_slash=True)
-        self.TAL_FILTER_PATH = f"{self._rootFolder}/tal/TAL_Filter.xml"  
-        self.NCD_PATH = Factory.CheckFolderExists(f"{self._rootFolder}/ncd", reverse_slash=True)
-        self.DATA_SETS_PATH_DEFAULT = Factory.CheckFolderExists(f"{self.NCD_PATH}/default/", reverse_slash=True)
-        self.DATA_SETS_PATH = Factory.CheckFolderExists(f"{self.NCD_PATH}/datasets/", reverse_slash=True)
         self.VIN = None
-        self.FA = Factory.CheckFolderExists(f"{self._rootFolder}/fa", reverse_slash=True)
         self.projectName = None
         self.BTLD = None
-        self.NCD_SIGNED_PATH = Factory.CheckFolderExists(f"{self.NCD_PATH}/signed", reverse_slash=True)
         self.NCD_SIGNED_VIN_PATH = None
-        self.NCD_UNSIGNED_PATH = Factory.CheckFolderExists(f"{self.NCD_PATH}/unsigned", reverse_slash=True)
-        self.SVT_FILE_PATH = f"{self.SVT}/SVT.xml"
-        self.FA_FILE_PATH = f"{self.FA}/FA.xml"
-        self._checkFileExists(self.TAL_FILTER_PATH)
         self._dataSetsUpToDate = True
         self._serverProcess = None
+        self._monitor = None
+        # lazy: folders are created/validated on first use instead of here
+        if self._config.get('lazy', 'false').lower() != 'true':
+            self._resolveFolders()
+
+    def _resolveFolders(self):
+        """
+        method that resolves (creates) all folders, validates the TAL filter and opens the transcript up front
+        """
+        for name in ("_rootFolder", "_logFolder", "_log", "_launcher", "SVT", "TAL_PATH", "NCD_PATH",
+                     "DATA_SETS_PATH_DEFAULT", "DATA_SETS_PATH", "DATA_SETS_PATH_ECU", "FA", "NCD_SIGNED_PATH",
+                     "NCD_UNSIGNED_PATH", "TAL_FILTER_PATH", "_artifacts", "_transcript"):
+            getattr(self, name)
+
+    @staticmethod
+    def _checkFolder(path, reverse_slash=True):
+        from tal.KeywordDrivenBase.Devices.Drivers import Factory
+        return Factory.CheckFolderExists(path, reverse_slash=reverse_slash)
+
+    @staticmethod
+    def _projectPath():
+        from tal.KeywordDrivenBase.Core.ConfigManager import PROJECT_PATH
+        return str(PROJECT_PATH)
+
+    @cached_property
+    def _rootFolder(self):
+        return self._checkFolder(f"{self._projectPath()}/{self._config['configdir']}")
+
+    @cached_property
+    def _logFolder(self):
+        return self._checkFolder(os.path.join(self._projectPath(), self._config['logdir']), reverse_slash=False)
+
+    @cached_property
+    def _log(self):
+        from EsysLog import EsysRunLog
+        return EsysRunLog(
+            self._logFolder,
+            run_id=self._config.get('run_id'),
+            max_bytes=int(float(self._config.get('log_max_mb', '10')) * 1024 * 1024),
+            keep_runs=int(self._config.get('log_keep_runs', '50')),
+        )
+
+    @cached_property
+    def _launcher(self):
+        from EsysLauncher import GetLauncher
+        return GetLauncher()
+
+    @cached_property
+    def _artifacts(self):
+        if self._config.get('artifacts', 'true').lower() != 'true':
+            return None
+        from EsysArtifacts import ArtifactStore
+        return ArtifactStore(
+            os.path.join(self._rootFolder, "artifacts"),
+            max_bytes=int(float(self._config.get('artifacts_max_mb', '2048')) * 1024 * 1024),
+            max_age=float(self._config.get('artifacts_max_days', '90')) * 24 * 3600,
+        )
+
+    @cached_property
+    def configDir(self):
+        return f"{self._rootFolder}/config"
+
+    @cached_property
+    def _masterCfg(self):
+        return f"{self.configDir}/master.config"
+
+    @cached_property
+    def _fwlCfg(self):
+        return f"{self.configDir}/fwl.config"
+
+    @cached_property
+    def _ncdCfg(self):
+        return f"{self.configDir}/ncd.config"
+
+    @cached_property
+    def _talCfg(self):
+        return f"{self.configDir}/tal_ecu_ncd.config"
+
+    @cached_property
+    def SVT(self):
+        return self._checkFolder(f"{self._rootFolder}/svt")
+
+    @cached_property
+    def TAL_PATH(self):
+        return self._checkFolder(f"{self._rootFolder}/tal")
+
+    @cached_property
+    def TAL_FILTER_PATH(self):
+        path = f"{self._rootFolder}/tal/TAL_Filter.xml"
+        self._checkFileExists(path)
+        return path
+
+    @cached_property
+    def NCD_PATH(self):
+        return self._checkFolder(f"{self._rootFolder}/ncd")
+
+    @cached_property
+    def DATA_SETS_PATH_DEFAULT(self):
+        return self._checkFolder(f"{self.NCD_PATH}/default/")
+
+    @cached_property
+    def DATA_SETS_PATH(self):
+        return self._checkFolder(f"{self.NCD_PATH}/datasets/")
+
+    @cached_property
+    def DATA_SETS_PATH_ECU(self):
+        return self._checkFolder(f"{self.NCD_PATH}/ecu/")
+
+    @cached_property
+    def _faFolder(self):
+        return self._checkFolder(f"{self._rootFolder}/fa")
+
+    @cached_property
+    def FA(self):
+        # replaced by the FA file of the configuration in _createMasterConfig
+        return self._faFolder
+
+    @cached_property
+    def NCD_SIGNED_PATH(self):
+        return self._checkFolder(f"{self.NCD_PATH}/signed")
+
+    @cached_property
+    def NCD_UNSIGNED_PATH(self):
+        return self._checkFolder(f"{self.NCD_PATH}/unsigned")
+
+    @cached_property
+    def SVT_FILE_PATH(self):
+        return f"{self.SVT}/SVT.xml"
+
+    @cached_property
+    def FA_FILE_PATH(self):
+        return f"{self._faFolder}/FA.xml"
+
+    @cached_property
+    def CHECKPOINT_PATH(self):
+        return f"{self.NCD_PATH}/checkpoint.json"
+
+    @property
+    def LOG_PATH(self):
+        """
+        log segment of the current run (see EsysLog)
+        """
+        return self._log.path
+
+    @property
+    def _isOpen(self):
+        return bool(self._session.state & SessionState.OPEN)
+
+    @property
+    def _isAuthenticated(self):
+        return bool(self._session.state & SessionState.AUTHENTICATED)
+
+    @property
+    def _isConnected(self):
+        return bool(self._session.state & SessionState.CONNECTED)
         
     def _checkConfigValid(self, config):
         """
@@ -101,38 +371,50 @@ class Esys:
         """
         method that opens esys server
         """
-        if self._isOpen: return self._isOpen
+        return self._session.ensure(SessionState.OPEN)
 
-        cmd = f"cmd.exe /c start {self._appPath} -startserver"
-        result, self._serverProcess = self._sendBatchCmd(cmd, end_process=False, shell=False)
+    def _startServer(self):
+        """
+        method that starts the esys server and waits until it answers
+        """
+        self._serverProcess = self._startServerProcess(self._esysCmd("-startserver"))
         maxTimeoutCnt = 40
-        cmd = f"{self._appPath} -server -check"
+        cmd = self._esysCmd("-server", "-check")
         while maxTimeoutCnt:
             result, log = self._sendBatchCmdAndGetLog(cmd)
             if result and not "Server is not running" in log:
                 if DEBUG: print('Server is Online')
-                self._isOpen = True
-                break
+                return True
             time.sleep(0.1)
             maxTimeoutCnt -= 1
-        else:
-            print('Server is Offline')
-            self.Close()
+        print('Server is Offline')
+        return False
 
-        return self._isOpen
+    def _serverAlive(self):
+        """
+        method that checks if the esys server is still running.
+        The process started by this instance is checked first, the server is only asked when
+        there is no such process (server of another Esys instance, replay) or it has exited
+        """
+        if self._serverProcess is not None and self._serverProcess.poll() is None:
+            return True
+        result, log = self._sendBatchCmdAndGetLog(self._esysCmd("-server", "-check"))
+        return result and not "Server is not running" in log
     
     def Connect(self):
         """
         method that creates the connection and reads the SVT and FA file from ECU and stores it
         """
-        if self._isConnected: return self._isConnected
+        return self._session.ensure(SessionState.OPEN | SessionState.CONNECTED)
 
-        cmd = f"{self._appPath} -server -openconnection {self._masterCfg}"
+    def _openConnection(self):
+        cmd = self._esysCmd("-server", "-openconnection", self._masterCfg)
         result = self._sendBatchCmd(cmd)
         if DEBUG:
             connectionStatus = "connected" if result else "NOT connected"
             print(f'ECU is {connectionStatus}')
-        if result: self._isConnected = True
+        if not result:
+            return result
         result &= self._createSVTFile()
         # result &= self._createFAFile()
         return result
@@ -143,8 +425,9 @@ class Esys:
         """
         if not self._isConnected: return True
         
-        result = self._sendBatchCmd(f"{self._appPath} -server -closeconnection")
-        if result: self._isConnected = False
+        result = self._sendBatchCmd(self._esysCmd("-server", "-closeconnection"))
+        if result:
+            self._session.transition(self._session.state & ~SessionState.CONNECTED, "-closeconnection")
         return result
     
     def Close(self):
@@ -152,66 +435,29 @@ class Esys:
         method that removes the connection to ecu and closes esys server
         """
         if not self._isOpen: return True
-        self._isOpen = False
         result = self.Disconnect()
-        result &= self._sendBatchCmd(f"{self._appPath} -server -stop")
+        self._session.transition(SessionState.CLOSED, "-stop")
+        result &= self._sendBatchCmd(self._esysCmd("-server", "-stop"))
 
         if self._serverProcess:
-            try:
-                print('Server is terminated.')
-                self._serverProcess.kill()
-            except:
-                # if any error is during this procedure, ignore it.
-                pass
-            self._serverProcess = None
-        self._killAllCmds()
+            print('Server is terminated.')
+        if not self._replayer:
+            self._launcher.Stop(self._serverProcess)
+        self._serverProcess = None
         return result
-
-    def _killAllCmds(self):
-        for process in psutil.process_iter(attrs=['pid', 'name']):
-            try:
-                # Check if the process name is cmd.exe
-                if 'cmd.exe' in process.info['name']:
-                    # Terminate the process by its PID
-                    os.system(f"taskkill /F /PID {process.info['pid']}")
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-                
-        # List all running processes using tasklist
-        tasklistOutput = subprocess.check_output("tasklist", universal_newlines=True)
-        
-        # Search for cmd.exe processes
-        for processName in tasklistOutput.split('\n'):
-            if "cmd.exe" in processName:
-                # Extract the PID and forcefully terminate the process
-                try:
-                    pid = int(processName.split()[1])
-                    subprocess.call(["taskkill", "/F", "/PID", str(pid)], shell=True)
-                except (IndexError, ValueError):
-                    pass
-        
-        # the last option is to kill it on the os side.
-        for process in psutil.process_iter(attrs=['pid', 'name']):
-            try:
-                import signal
-                # Check if the process name is cmd.exe
-                if 'cmd.exe' in process.info['name']:
-                    os.kill(process.info['pid'], signal.CTRL_C_EVENT)
-            except:
-                pass
     
     def Authenticate(self):
         """
         method use to authenticate via swl certificate
         """
-        if self._isAuthenticated: return self._isAuthenticated
-        
-        cmd = f"{self._appPath} -server -authenticationCoding -connection internet -useSwlSecCertificate"
+        return self._session.ensure(SessionState.OPEN | SessionState.AUTHENTICATED)
+
+    def _authenticate(self):
+        cmd = self._esysCmd("-server", "-authenticationCoding", "-connection", "internet", "-useSwlSecCertificate")
         result = self._sendBatchCmd(cmd)
         if DEBUG:
             authStatus = "succeeded" if result else "NOT succeeded"
             print(f'ECU Authentication {authStatus}')
-        if result: self._isAuthenticated = True
         return result
     
     def WriteCertificate(self, certificate, keypack, svt):
@@ -223,14 +469,10 @@ class Esys:
         svt_path = 'D:/SWVersions/CertCyber/SVT.xml'
         output_path = path + '\\Keys.xml'
         """
-        result = True
-        result &= self.Open()
-        if not result:
-            # do one retry in case of Server Offline
-            result = self.Open()
-        result &= self.Authenticate()
-        result &= self.Connect()
-        cmd = f"{self._appPath} -server -writeBindings -connection {self._masterCfg} -in {certificate} -secOCKeysPath {keypack} -svt {svt}"
+        if not self._session.ensure(SessionState.READY):
+            return False
+        cmd = self._esysCmd("-server", "-writeBindings", "-connection", self._masterCfg, "-in", certificate,
+                            "-secOCKeysPath", keypack, "-svt", svt)
         result = self._sendBatchCmd(cmd)
         if DEBUG:
             status = "succeeded" if result else "NOT succeeded"
@@ -255,7 +497,7 @@ class Esys:
         """
         projectName = self._generateProjName(pdx_path)
         if self._isImported: return self._isImported
-        cmd = f"{self._appPath}   -pdximport {pdx_path} -project {projectName}"
+        cmd = self._esysCmd("-pdximport", pdx_path, "-project", projectName)
 
         result = self._sendBatchCmd(cmd)
         if DEBUG:
@@ -268,25 +510,21 @@ class Esys:
         """
         method used to flash full pdx
         """
-        result = True
-        result &= self.Open()
-        if not result:
-            # do one retry in case of Server Offline
-            result = self.Open()
-        result &= self.Authenticate()
-        result &= self.Connect()
-        if pdx_path:
-            result = self.ImportPdx(pdx_path)
-            if not result: return result
-        
-        cmd = f"{self._appPath} -server -talexecution {self._masterCfg} -ignoreBATHAF"
-        result = self._sendBatchCmd(cmd)
-        if DEBUG:
-            flashStatus = "completed" if result else "NOT completed"
-            print(f'ECU flashing is {flashStatus}')
-        if close_server:
-            result &= self.Close()
-        return result   
+        with self._monitored("FlashPdx"):
+            if not self._session.ensure(SessionState.READY):
+                return False
+            if pdx_path:
+                result = self.ImportPdx(pdx_path)
+                if not result: return result
+
+            cmd = self._esysCmd("-server", "-talexecution", self._masterCfg, "-ignoreBATHAF")
+            result = self._sendBatchCmd(cmd)
+            if DEBUG:
+                flashStatus = "completed" if result else "NOT completed"
+                print(f'ECU flashing is {flashStatus}')
+            if close_server:
+                result &= self.Close()
+            return result   
     
     def RestoreDataSets(self):
         """
@@ -309,21 +547,18 @@ class Esys:
         if check_modified:
             if self._dataSetsUpToDate:
                 return result
-        result &= self.Open()
-        if not result:
-            # do one retry in case of Server Offline
-            result &= self.Open()
-        result &= self.Authenticate()
-        result &= self.Connect()
-        
-        if not self._localDataSets:
-            result &= self._readDataSetsFromECU()
-        result &= self._convertDataSets()
-        result &= self._signDataSets()
-        
-        talCfgPath = self._createTalEcuNcdConfig()
-        cmd = f"{self._appPath} -server -talexecution {talCfgPath}"
-        result &= self._sendBatchCmd(cmd)
+        with self._monitored("UploadDataSets"):
+            if not self._session.ensure(SessionState.READY):
+                return False
+
+            if not self._localDataSets:
+                result &= self._readDataSetsFromECU()
+            result &= self._convertDataSets()
+            result &= self._signDataSets()
+
+            talCfgPath = self._createTalEcuNcdConfig()
+            cmd = self._esysCmd("-server", "-talexecution", talCfgPath)
+            result &= self._sendBatchCmd(cmd)
         if DEBUG:
             dataStatus = "successfully" if result else "could NOT be"
             print(f"Data codings files {dataStatus} flashed to ECU")
@@ -354,11 +589,39 @@ class Esys:
         self._dataSetsUpToDate = False
         return True
 
+    def CompareDataSets(self, read_ecu=False):
+        """
+        method that compares the FWL files of 'NCD/default' and 'NCD/datasets' and, with read_ecu,
+        the coding read back from the ECU into 'NCD/ecu'.
+        Returns the report (see FwlDiff) and stores it as json in the log folder
+        """
+        from FwlDiff import Compare
+        trees = [self.DATA_SETS_PATH_DEFAULT, self.DATA_SETS_PATH]
+        labels = ["default", "datasets"]
+        if read_ecu:
+            self._readDataSetsFromECU(self.DATA_SETS_PATH_ECU)
+            trees.append(self.DATA_SETS_PATH_ECU)
+            labels.append("ecu")
+        report = Compare(*trees, labels=labels)
+        reportPath = os.path.join(self._logFolder, f"FwlDiff_{self._log.runId}.json")
+        with open(reportPath, 'w', encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+        if DEBUG:
+            for diff in report["diffs"]:
+                print(f"FWL diff {diff['old']} -> {diff['new']}: {diff['summary']}")
+        return report
+
     def _getParameter(self, name):
         # value, byte_start, length parameters to be added
         # go inside all FWL files, search for parameter name, modify value (if hex bytes, from byte to byte)
         if not self._localDataSets:
             self._readDataSetsFromECU()
+        return self._findParameter(name)
+
+    def _findParameter(self, name):
+        """
+        method that returns (data, value, fwl lines, fwl file) of a parameter in the 'NCD/datasets' FWL files
+        """
         parmData = ""
         fwlList = self._getFilesAsList(self.DATA_SETS_PATH,".fwl", full_path = True)
         fwlFileName = None
@@ -444,13 +707,30 @@ class Esys:
         """
         method that converts FWL files into usigned NCD's
         """
+        inputs, cmd = self._prepareConversion()
+        if not cmd:
+            return True
+        return self._finishConversion(inputs, self._sendBatchCmd(cmd))
+
+    def _prepareConversion(self):
+        """
+        method that returns the stage inputs and the conversion command (None when it can be skipped)
+        """
+        inputs = {"fwl": self._hashFiles(self.DATA_SETS_PATH, ".fwl"), "fa": self._hashFile(self.FA)}
+        if self._stageUpToDate("fwl2Ncd", inputs, self.NCD_UNSIGNED_PATH):
+            if DEBUG: print("Data codings (NCD unsigned) files up to date, conversion skipped")
+            return inputs, None
+        if self._restoreStage("fwl2Ncd", inputs, self.NCD_UNSIGNED_PATH):
+            if DEBUG: print("Data codings (NCD unsigned) files restored from the artifact store, conversion skipped")
+            return inputs, None
+
         fwlPath = self._createFwlConfig()    
         files = self._getFilesAsList(self.NCD_UNSIGNED_PATH, ".ncd", full_path = True)
         for file in files: os.remove(file)
-        
-        cmd = f"{self._appPath} -server -fwl2Ncd {fwlPath}"
-        result = self._sendBatchCmd(cmd)
-        
+        return inputs, self._esysCmd("-server", "-fwl2Ncd", fwlPath)
+
+    def _finishConversion(self, inputs, result):
+        self._commitStage("fwl2Ncd", inputs, self.NCD_UNSIGNED_PATH, result)
         if DEBUG:
             dataStatus = "successfully created" if result else "could NOT be created"
             print(f"Data codings (NCD unsigned) files {dataStatus} from FWL's")
@@ -477,18 +757,112 @@ class Esys:
         """
         method that sends unsigned NCD's to be signed
         """
+        inputs, cmd = self._prepareSigning()
+        if not cmd:
+            return True
+        return self._finishSigning(inputs, self._sendBatchCmd(cmd))
+
+    def _prepareSigning(self):
+        """
+        method that returns the stage inputs and the signing command (None when it can be skipped)
+        """
+        inputs = {
+            "ncd": self._hashFiles(self.NCD_UNSIGNED_PATH, ".ncd"),
+            "fa": self._hashFile(self.FA),
+            "vin": self.VIN,
+            "btld": self.BTLD,
+        }
+        if self._stageUpToDate("signNcd", inputs, self.NCD_SIGNED_VIN_PATH):
+            if DEBUG: print("Data codings (NCD) files already signed, signing skipped")
+            return inputs, None
+        if self._restoreStage("signNcd", inputs, self.NCD_SIGNED_VIN_PATH):
+            if DEBUG: print("Data codings (NCD) signed files restored from the artifact store, signing skipped")
+            return inputs, None
+
         path = self._createNcdConfig()
         files = self._getFilesAsList(self.NCD_SIGNED_VIN_PATH, ".ncd", full_path = True)
         for file in files: os.remove(file)
-        
-        cmd = f"{self._appPath} -server -signNcd {path}"
-        result = self._sendBatchCmd(cmd)
-        
+        return inputs, self._esysCmd("-server", "-signNcd", path)
+
+    def _finishSigning(self, inputs, result):
+        self._commitStage("signNcd", inputs, self.NCD_SIGNED_VIN_PATH, result)
         if DEBUG:
             dataStatus = "successfully been signed" if result else "could NOT be signed"
             print(f"Data codings (NCD) files {dataStatus}")
         return result
     
+    @staticmethod
+    def _hashFile(path):
+        """
+        utility method that returns the sha1 of a file's content, None if there is no such file
+        """
+        import hashlib
+        try:
+            with open(path, 'rb') as file:
+                return hashlib.sha1(file.read()).hexdigest()
+        except (OSError, TypeError):
+            return None
+
+    @classmethod
+    def _hashFiles(cls, folder, suffix=""):
+        """
+        utility method that returns {file name: sha1} of the files in a folder
+        """
+        hashes = {}
+        try:
+            entries = list(os.scandir(folder))
+        except FileNotFoundError:
+            return hashes
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(suffix):
+                hashes[entry.name] = cls._hashFile(entry.path)
+        return hashes
+
+    def _loadCheckpoint(self):
+        try:
+            with open(self.CHECKPOINT_PATH, encoding="utf-8") as manifest:
+                return json.load(manifest)
+        except (OSError, ValueError):
+            return {}
+
+    def _stageUpToDate(self, stage, inputs, output_path):
+        """
+        method that checks the checkpoint manifest: a stage can be skipped when it ran with the
+        same inputs before and all the files it produced are still there, unchanged
+        """
+        checkpoint = self._loadCheckpoint().get(stage)
+        if not checkpoint or checkpoint["inputs"] != inputs or not checkpoint["outputs"]:
+            return False
+        return checkpoint["outputs"] == self._hashFiles(output_path, ".ncd")
+
+    def _commitStage(self, stage, inputs, output_path, result, store=True):
+        """
+        method that records a finished stage (or forgets it when it failed) in the checkpoint manifest
+        """
+        manifest = self._loadCheckpoint()
+        if result:
+            manifest[stage] = {"inputs": inputs, "outputs": self._hashFiles(output_path, ".ncd"), "time": time.time()}
+            if store and self._artifacts:
+                self._artifacts.Put(stage, self._config.get('vin'), inputs, output_path, ".ncd")
+        else:
+            manifest.pop(stage, None)
+        with open(self.CHECKPOINT_PATH, 'w', encoding="utf-8") as out:
+            json.dump(manifest, out, indent=2)
+
+    def _restoreStage(self, stage, inputs, output_path):
+        """
+        method that links the files of an earlier run with the same inputs from the artifact store
+        into the output folder; returns False when the store does not know these inputs
+        """
+        if not self._artifacts:
+            return False
+        manifest = self._artifacts.Lookup(stage, self._config.get('vin'), inputs)
+        if not manifest or not manifest["files"]:
+            return False
+        self._artifacts.Materialize(manifest, output_path, ".ncd")
+        self._commitStage(stage, inputs, output_path, True, store=False)
+        return True
+
     def _createTalEcuNcdConfig(self):
         """
         method that creates the config in order to flash the signed NCD's
@@ -511,14 +885,21 @@ class Esys:
         """
         method that cleans old SVT and reads the newest SVT file from ECU
         """
+        return self._finishSVTFile(self._sendBatchCmd(self._prepareSVTFile()))
+
+    def _prepareSVTFile(self):
         # clean old files
         files = self._getFilesAsList(self.SVT, ".xml", full_path = True)
         for file in files: os.remove(file)
-        
-        cmd = f"{self._appPath} -server -readsvt -connection {self._masterCfg} -out {self.SVT_FILE_PATH}"
-        result = self._sendBatchCmd(cmd)
-        
+        return self._esysCmd("-server", "-readsvt", "-connection", self._masterCfg, "-out", self.SVT_FILE_PATH)
+
+    def _finishSVTFile(self, result):
         self._checkFileExists(self.SVT_FILE_PATH)
+        if result and self._artifacts:
+            # keep the SVT/FA history of every vehicle
+            self._artifacts.Put("svt", self._config.get('vin'), self._hashFiles(self.SVT, ".xml"), self.SVT, ".xml")
+            if os.path.isfile(self.FA):
+                self._artifacts.PutFiles("fa", self._config.get('vin'), {"fa": self._hashFile(self.FA)}, [self.FA])
         if DEBUG:
             svtStatus = "created" if result else "could NOT be created"
             print(f'ECU SVT file {svtStatus}')
@@ -526,20 +907,15 @@ class Esys:
     
     def CreateCertRequestFile(self):
        
-        result = True
-        result &= self.Open()
-        if not result:
-            # do one retry in case of Server Offline
-            result = self.Open()
- 
-        result &= self.Authenticate()
-        result &= self.Connect()
+        if not self._session.ensure(SessionState.READY):
+            return False
  
         # cmd = f"{self._appPath} -server -writeBindings -connection {self._masterCfg} -in {certificate} -secOCKeysPath {keypack} -svt {svt}"
-        cmd = f"{self._appPath} -server -generateCSR -connection {self._masterCfg} -out C:\Data\CERT\requestCBB.txt -vin BMWTEST111H123456" 
+        cmd = self._esysCmd("-server", "-generateCSR", "-connection", self._masterCfg,
+                            "-out", r"C:\Data\CERT\requestCBB.txt", "-vin", "BMWTEST111H123456")
  
         # E-Sys.bat -generateCSR -connection C:\conf\connection.properties -out C:\Data\CERT\requestCBB[JSON].txt
-        result = self.return_code(cmd=cmd, return_code=False)
+        result = self._sendBatchCmd(cmd, return_code=False)
 
         if DEBUG:
             status = "succeeded" if result else "NOT succeeded"
@@ -559,7 +935,7 @@ class Esys:
         # print(directory_path)     
         # os.remove(directory_path)
                 
-        cmd = f"{self._appPath} -server -readfa -connection {self._masterCfg} -out {self.FA_FILE_PATH}"
+        cmd = self._esysCmd("-server", "-readfa", "-connection", self._masterCfg, "-out", self.FA_FILE_PATH)
         result = self._sendBatchCmd(cmd)
         
         self._checkFileExists(self.FA_FILE_PATH)
@@ -568,24 +944,32 @@ class Esys:
             print(f'ECU FA file {svtStatus}')
         return result
     
-    def _readDataSetsFromECU(self):
-        """
-        method that reads data from ECU and stores NCD and FWL files in /NCD/datasets
-        """
-        self.Open()
-        self.Connect()
-        files = self._getFilesAsList(self.DATA_SETS_PATH, ".fwl", full_path = True)
+    def _readDataSetsFromECU(self, out_path=None):
+        """
+        method that reads data from ECU and stores NCD and FWL files in /NCD/datasets (or out_path)
+        """
+        out_path = out_path or self.DATA_SETS_PATH
+        # only undo what this method opened, callers may still need the session
+        previousState = self._session.state
+        if not self._session.ensure(SessionState.OPEN | SessionState.CONNECTED):
+            self._session.restore(previousState)
+            return False
+        result = self._sendBatchCmd(self._prepareReadDataSets(out_path))
+        self._session.restore(previousState)
+        return self._finishReadDataSets(result)
+
+    def _prepareReadDataSets(self, out_path):
+        files = self._getFilesAsList(out_path, ".fwl", full_path = True)
         for file in files: os.remove(file)
-        
-        cmd = f"{self._appPath} -server -readNcd {self.SVT_FILE_PATH} -connection {self._masterCfg} -out {self.DATA_SETS_PATH} -notReadVin"
-        result = self._sendBatchCmd(cmd)
+        return self._esysCmd("-server", "-readNcd", self.SVT_FILE_PATH, "-connection", self._masterCfg,
+                             "-out", out_path, "-notReadVin")
+
+    def _finishReadDataSets(self, result):
         if not result:
-            self.Close()
             raise Exception("ERROR: Failed to download data sets from ECU")
         if DEBUG:
             dataStatus = "created" if result else "could NOT be created"
             print(f'ECU dataset files (NCD and FWL) {dataStatus}')
-        self.Close()
         return result
 
     def _deployDefaultDataSets(self):
@@ -602,6 +986,7 @@ class Esys:
         for file in files: os.remove(file)
         
         # copy default datasets
+        import shutil
         files = self._getFilesAsList(self.DATA_SETS_PATH_DEFAULT, ".fwl")
         for file in files:
             shutil.copy(self.DATA_SETS_PATH_DEFAULT + file, self.DATA_SETS_PATH)
@@ -658,27 +1043,120 @@ class Esys:
             self.Close()
             raise Exception(f"ERROR: Couldn't find file to write config to {path}")
 
-    def _sendBatchCmd(self, cmd, end_process=True, shell=True, return_code=True):
+    @cached_property
+    def _transcript(self):
+        """
+        (recorder, replayer) of the E-Sys commands (see EsysTranscript), set up on the first command
+        so the lazy folders stay unresolved until then
+        """
+        record = self._config.get('record')
+        replay = self._config.get('replay')
+        if not record and not replay:
+            return None, None
+        from EsysTranscript import TranscriptRecorder, TranscriptReplayer
+        substitutions = {"$ROOT": self._rootFolder, "$LOG": self._logFolder, "$APP": self._appPath}
+        if replay:
+            path = os.path.join(self._logFolder, replay)
+            return None, TranscriptReplayer(path, substitutions, float(self._config.get('replay_speed', '1')))
+        path = os.path.join(self._logFolder, record)
+        return TranscriptRecorder(path, substitutions), None
+
+    @property
+    def _recorder(self):
+        return self._transcript[0]
+
+    @property
+    def _replayer(self):
+        return self._transcript[1]
+
+    def _monitored(self, phase):
+        """
+        returns a context that samples the server and client resources while 'phase' runs (see EsysMonitor)
+        """
+        if self._config.get('monitor', 'false').lower() != 'true':
+            return contextlib.nullcontext()
+        if not self._monitor:
+            from EsysMonitor import ResourceSampler
+            extension = "csv" if self._config.get('monitor_format', 'jsonl') == 'csv' else "jsonl"
+            self._monitor = ResourceSampler(
+                self._monitorRoots,
+                os.path.join(self._logFolder, f"EsysMonitor_{self._log.runId}.{extension}"),
+                interval=float(self._config.get('monitor_interval', '1')),
+                thresholds={
+                    "rss_mb": float(self._config.get('monitor_rss_mb', '0')),
+                    "handles": int(self._config.get('monitor_handles', '0')),
+                    "threads": int(self._config.get('monitor_threads', '0')),
+                },
+            )
+        return self._sampling(phase)
+
+    @contextlib.contextmanager
+    def _sampling(self, phase):
+        self._monitor.Start(phase)
+        try:
+            yield
+        finally:
+            self._monitor.Stop()
+
+    def _monitorRoots(self):
+        """
+        returns the root processes of the sampled trees, the server is sampled before the client
+        so the client tree does not count it twice
+        """
+        # a server started by another Esys instance (or a replayed session) is not ours to sample
+        serverPids = [self._serverProcess.pid] if self._serverProcess else []
+        return {"server": serverPids, "client": [os.getpid()]}
+
+    def _esysCmd(self, *args):
+        """
+        method that builds the argument vector of an e-sys batch command
+        """
+        return [self._appPath, *args]
+
+    def _startServerProcess(self, cmd):
+        """
+        method that starts the e-sys server in the background and returns the process obj to stop it later
+        """
+        if DEBUG:
+            print (f"----->> {_cmdLine(cmd)}")
+        if self._replayer:
+            self._replayer.execute(cmd)
+            return None
+        process = self._launcher.Start(cmd)
+        if self._recorder:
+            self._recorder.record(cmd, None, "", "", time.time(), 0.0)
+        return process
+
+    def _sendBatchCmd(self, cmd, return_code=True):
         """
         method used to send a command over e-sys batch file
         """
         result = True
-        log = open(self.LOG_PATH, 'a+')
+        cmdLine = _cmdLine(cmd)
         if DEBUG:
-            print (f"----->> {cmd}")
+            print (f"----->> {cmdLine}")
 
-        process = Popen(cmd.split(" "), stdout=log, stdin=subprocess.PIPE, shell=shell)
-        process.wait()
-        log.flush()
-        log.close()
+        if self._replayer:
+            returncode, stdout, stderr = self._replayer.execute(cmd)
+            self._log.Write(cmdLine, returncode, stdout)
+        else:
+            start = time.time()
+            log = self._log.Begin()
+            # while recording, the output goes through a pipe into the log
+            capture = self._recorder is not None
+            returncode, stdout, stderr = self._launcher.Run(cmd, stdout=log, capture=capture)
+            if capture:
+                log.write(stdout + stderr)
+            self._log.End(log, cmdLine, returncode)
+            if self._recorder:
+                self._recorder.record(cmd, returncode, stdout, stderr, start, time.time() - start)
         
-        if not end_process:
-            # return the process obj to kill it later
-            return result, process
         if return_code:
-            if process.returncode != 0: 
+            if returncode != 0: 
                 result = False
-        process.kill()
+        if result and "-server" in cmd:
+            # the server just answered, no need to verify it is alive
+            self._session.markAlive()
         return result
 
     def _sendBatchCmdAndGetLog(self, cmd):
@@ -686,17 +1164,75 @@ class Esys:
         method used to send a command over e-sys batch file
         """
         if DEBUG:
-            print (f"----->> {cmd}")
+            print (f"----->> {_cmdLine(cmd)}")
 
-        try:
-            process = Popen(cmd.split(" "), shell=self._serverShell, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            process.wait()
-            stdout, stderr = process.communicate()
-            process.kill()
-            if process.returncode == 0:
-                return True, stdout.strip()  # Return True for success and the output
-            else:
-                return False, stderr.strip()  # Return False for failure and the error message
-        except Exception as e:
-            process.kill()
-            return False, stdout.strip()+str(e)  # Return False and the exception message if an error occurs
+        if self._replayer:
+            returncode, stdout, stderr = self._replayer.execute(cmd)
+        else:
+            try:
+                start = time.time()
+                returncode, stdout, stderr = self._launcher.Run(cmd, capture=True)
+            except Exception as e:
+                return False, str(e)  # Return False and the exception message if an error occurs
+            if self._recorder:
+                self._recorder.record(cmd, returncode, stdout, stderr, start, time.time() - start)
+        if returncode == 0:
+            return True, stdout.strip()  # Return True for success and the output
+        return False, stderr.strip()  # Return False for failure and the error message
+
+
+def ProfileStartup(config, lazy=True, top=15):
+    """
+    method that reports the import cost of this module (largest top level imports) and the time
+    to construct an Esys device, measured in a fresh interpreter
+    """
+    import subprocess, sys
+    config = dict(config, lazy='true' if lazy else 'false')
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import Esys\n"
+        "imported = time.perf_counter()\n"
+        f"Esys.Esys(json.loads({json.dumps(json.dumps(config))}))\n"
+        "constructed = time.perf_counter()\n"
+        "heavy = [name for name in ('tal', 'psutil', 'shutil', 'subprocess') if name in sys.modules]\n"
+        "print(json.dumps({'import': imported - start, 'construct': constructed - imported, 'loaded': heavy}))\n"
+    )
+    moduleFolder = os.path.dirname(os.path.abspath(__file__))
+    child = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=moduleFolder,
+                           capture_output=True, text=True)
+    if child.returncode != 0:
+        raise Exception(f"ERROR: Esys startup profile failed: {child.stderr.strip()[-2000:]}")
+
+    # '-X importtime' lines: 'import time: <self us> | <cumulative us> | <indented module>'
+    imports = []
+    for line in child.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        selfTime, cumulative, module = line[len("import time:"):].split("|")
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        if depth > 1:
+            # only the modules imported by the snippet and their direct imports
+            continue
+        imports.append((int(cumulative), module.strip()))
+    report = json.loads(child.stdout.splitlines()[-1])
+    print(f"Esys startup ({'lazy' if lazy else 'eager'}): import {report['import'] * 1000:.1f} ms, "
+          f"construction {report['construct'] * 1000:.1f} ms")
+    print(f"Heavy modules loaded: {', '.join(report['loaded']) or 'none'}")
+    for cumulative, module in sorted(imports, reverse=True)[:top]:
+        print(f"{cumulative / 1000:10.1f} ms  {module}")
+    return report
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Esys startup profile")
+    parser.add_argument("--config", required=True, help="json file with the Esys device parameters")
+    parser.add_argument("--eager", action="store_true", help="profile the eager (non lazy) construction")
+    args = parser.parse_args(argv)
+    with open(args.config, encoding="utf-8") as f:
+        ProfileStartup(json.load(f), lazy=not args.eager)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Content addressed store for the files produced by the E-Sys stages (SVT, unsigned and signed NCD's).
+
+Layout below the store folder:
+
+    blobs/<sha1[:2]>/<sha1>                     file content, stored once for all VINs and runs
+    manifests/<VIN>/<stage>/<inputs key>.json   {"stage", "vin", "inputs", "files": {name: sha1}, "time"}
+
+The inputs key is the sha1 of the stage inputs (the same inputs the checkpoint manifest uses), so
+a stage that runs again with inputs seen before is answered by copying the stored files into the
+working folder instead of running the E-Sys command.
+
+Enable/tune it through the Esys device configuration:
+
+    <PARM name='artifacts' value='true'/>             'false' disables the store
+    <PARM name='artifacts_max_mb' value='2048'/>      evict least recently used manifests above this size
+    <PARM name='artifacts_max_days' value='90'/>      evict manifests not used for this many days
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+
+def _sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def InputsKey(inputs):
+    """
+    returns the key of a stage inputs dict (independent of the key order)
+    """
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+class ArtifactStore:
+    def __init__(self, folder, max_bytes=2048 * 1024 * 1024, max_age=90 * 24 * 3600):
+        self.folder = folder
+        self._blobs = os.path.join(folder, "blobs")
+        self._manifests = os.path.join(folder, "manifests")
+        self._maxBytes = max_bytes
+        self._maxAge = max_age
+        # bytes in blobs/, counted on the first write and kept up to date from then on
+        self._size = None
+        os.makedirs(self._blobs, exist_ok=True)
+        os.makedirs(self._manifests, exist_ok=True)
+
+    def _blobPath(self, sha):
+        return os.path.join(self._blobs, sha[:2], sha)
+
+    def _manifestPath(self, stage, vin, inputs):
+        return os.path.join(self._manifests, vin or "_", stage, f"{InputsKey(inputs)}.json")
+
+    def Lookup(self, stage, vin, inputs):
+        """
+        method that returns the manifest of a stage run with the same inputs (None if unknown
+        or one of its blobs was evicted)
+        """
+        path = self._manifestPath(stage, vin, inputs)
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("inputs") != inputs:
+            return None
+        if not all(os.path.isfile(self._blobPath(sha)) for sha in manifest["files"].values()):
+            return None
+        # the manifest mtime is the 'last used' time for the eviction
+        os.utime(path)
+        return manifest
+
+    def Put(self, stage, vin, inputs, folder, suffix=""):
+        """
+        method that stores the files of a folder as the result of a stage and returns the manifest
+        """
+        paths = [entry.path for entry in os.scandir(folder) if entry.is_file() and entry.name.endswith(suffix)]
+        return self.PutFiles(stage, vin, inputs, paths)
+
+    def PutFiles(self, stage, vin, inputs, paths):
+        """
+        method that stores a list of files as the result of a stage and returns the manifest
+        """
+        files = {}
+        for path in paths:
+            sha = _sha1(path)
+            blob = self._blobPath(sha)
+            if not os.path.isfile(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                # copy to a temporary name first, an interrupted copy must not become a blob
+                shutil.copyfile(path, blob + ".tmp")
+                os.replace(blob + ".tmp", blob)
+                if self._size is not None:
+                    self._size += os.path.getsize(blob)
+            files[os.path.basename(path)] = sha
+        manifest = {"stage": stage, "vin": vin, "inputs": inputs, "files": files, "time": time.time()}
+        path = self._manifestPath(stage, vin, inputs)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        # the first write of a session also drops the aged manifests, later ones only evict over budget
+        if self._size is None or self._size > self._maxBytes:
+            self.Evict()
+        return manifest
+
+    def Materialize(self, manifest, folder, suffix=""):
+        """
+        method that replaces the files of a working folder by the files of a manifest.
+        Files are copied, a link would let a later write to the working file change the blob
+        """
+        os.makedirs(folder, exist_ok=True)
+        for entry in os.scandir(folder):
+            if entry.is_file() and entry.name.endswith(suffix):
+                os.remove(entry.path)
+        for name, sha in manifest["files"].items():
+            target = os.path.join(folder, name)
+            shutil.copy2(self._blobPath(sha), target)
+
+    def History(self, vin, stage):
+        """
+        method that returns the manifests of a VIN and stage, newest first
+        """
+        manifests = []
+        folder = os.path.join(self._manifests, vin or "_", stage)
+        if not os.path.isdir(folder):
+            return manifests
+        for entry in os.scandir(folder):
+            with open(entry.path, encoding="utf-8") as f:
+                manifests.append(json.load(f))
+        return sorted(manifests, key=lambda manifest: manifest["time"], reverse=True)
+
+    def Evict(self):
+        """
+        method that drops manifests older than max_age, then the least recently used ones until the
+        blobs fit into max_bytes, and finally the blobs no manifest refers to anymore
+        """
+        now = time.time()
+        manifests = []
+        for root, _, names in os.walk(self._manifests):
+            for name in names:
+                path = os.path.join(root, name)
+                used = os.path.getmtime(path)
+                if now - used > self._maxAge:
+                    os.remove(path)
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    manifests.append((used, path, set(json.load(f)["files"].values())))
+        manifests.sort()
+
+        sizes = {}
+        for root, _, names in os.walk(self._blobs):
+            for name in names:
+                sizes[name] = os.path.getsize(os.path.join(root, name))
+
+        referenced = set().union(*(shas for _, _, shas in manifests))
+        total = sum(sizes[sha] for sha in referenced if sha in sizes)
+        while manifests and total > self._maxBytes:
+            _, path, shas = manifests.pop(0)
+            os.remove(path)
+            stillUsed = set().union(*(other for _, _, other in manifests))
+            total -= sum(sizes.get(sha, 0) for sha in shas - stillUsed)
+            referenced = stillUsed
+
+        self._size = sum(sizes.values())
+        for sha in sizes.keys() - referenced:
+            if sha.endswith(".tmp"):
+                continue
+            try:
+                os.remove(self._blobPath(sha))
+                self._size -= sizes[sha]
+            except OSError:
+                # still opened by E-Sys
+                pass
@@ -0,0 +1,359 @@
+"""
+Local E-Sys daemon: one process owns the E-Sys server session and every test
+process on the bench talks to it over a local socket instead of starting its own server.
+
+Start it once per bench:
+
+    python EsysDaemon.py --config Config/Devices/Esys/esys.json [--host 127.0.0.1] [--port 50650]
+
+'esys.json' holds the same device parameters as the TAL-DEVICE entry (see Esys docstring),
+e.g. {"configdir": "Config/Devices/Esys", "logdir": "Reports", "localdatasets": "true", ...}
+
+and use EsysClient in the test processes:
+
+    esys = EsysClient()
+    esys.SetParameter("AccRunningModeActivateSupress", 255)
+    esys.UploadDataSets(check_modified=True)
+
+Protocol: JSON-RPC 2.0, one JSON object per line, over TCP on the loopback interface.
+"""
+import argparse
+import contextlib
+import inspect
+import json
+import socket
+import socketserver
+import threading
+
+from Esys import Esys
+
+DEBUG = False
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 50650
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+ESYS_ERROR = -32000
+
+
+class _ReadWriteLock:
+    """
+    lock that lets any number of readers in at the same time, but writers exclusively
+    """
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waitingWriters = 0
+
+    def acquireRead(self):
+        with self._cond:
+            # writers waiting get priority, otherwise a stream of GetParameter calls starves SetParameter
+            while self._writer or self._waitingWriters:
+                self._cond.wait()
+            self._readers += 1
+
+    def releaseRead(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquireWrite(self):
+        with self._cond:
+            self._waitingWriters += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waitingWriters -= 1
+            self._writer = True
+
+    def releaseWrite(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class EsysDaemon:
+    """
+    owns one Esys instance (and with it one warm E-Sys server) and exposes its public
+    methods over a local socket.
+
+    ECU-bound work (flashing, coding upload, certificates) is serialized with a single lock.
+    FWL queries only take a shared read lock on the dataset files, so they are answered
+    concurrently with each other and while a flash is running.
+    """
+    def __init__(self, config, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self._esys = Esys(config)
+        self._host = host
+        self._port = port
+        self._ecuLock = threading.Lock()
+        self._fwlLock = _ReadWriteLock()
+        self._server = None
+        self._methods = {
+            "FlashPdx": self._flashPdx,
+            "UploadDataSets": self._uploadDataSets,
+            "GetParameter": self._getParameter,
+            "SetParameter": self._setParameter,
+            "WriteCertificate": self._writeCertificate,
+            "Ping": self._ping,
+            "Shutdown": self._shutdown,
+        }
+
+    @property
+    def address(self):
+        if self._server:
+            return self._server.server_address
+        return self._host, self._port
+
+    def Start(self):
+        """
+        method that initializes the device, warms up the E-Sys server and binds the socket
+        """
+        self._esys.Initialize()
+        if not self._esys.Open():
+            # do one retry in case of Server Offline
+            if not self._esys.Open():
+                raise Exception("ERROR: EsysDaemon: E-Sys server could not be started")
+        self._server = _EsysRpcServer((self._host, self._port), _EsysRpcHandler, self)
+        if DEBUG:
+            print(f"EsysDaemon listening on {self.address[0]}:{self.address[1]}")
+
+    def ServeForever(self):
+        """
+        method that answers requests until Shutdown is requested or the process is interrupted
+        """
+        if not self._server:
+            self.Start()
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.Stop()
+
+    def Stop(self):
+        """
+        method that closes the socket and stops the E-Sys server owned by the daemon
+        """
+        if self._server:
+            self._server.server_close()
+            self._server = None
+        with self._ecuLock:
+            self._esys.Close()
+
+    def Dispatch(self, request):
+        """
+        method that executes one JSON-RPC request dict and returns the response dict
+        (None for notifications)
+        """
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or \
+           not isinstance(request.get("method"), str):
+            return self._error(None, INVALID_REQUEST, "Invalid Request")
+
+        reqId = request.get("id")
+        method = self._methods.get(request["method"])
+        if not method:
+            return self._error(reqId, METHOD_NOT_FOUND, f"Method not found: {request['method']}")
+
+        params = request.get("params", [])
+        if isinstance(params, list):
+            args, kwargs = params, {}
+        elif isinstance(params, dict):
+            args, kwargs = [], params
+        else:
+            return self._error(reqId, INVALID_PARAMS, "Invalid params")
+        try:
+            inspect.signature(method).bind(*args, **kwargs)
+        except TypeError as e:
+            return self._error(reqId, INVALID_PARAMS, str(e))
+
+        try:
+            result = method(*args, **kwargs)
+        except Exception as e:
+            # Esys reports its own failures as plain Exception("ERROR: ..."), anything else is a bug
+            code = ESYS_ERROR if type(e) is Exception else INTERNAL_ERROR
+            return self._error(reqId, code, str(e))
+
+        if "id" not in request:
+            return None
+        return {"jsonrpc": "2.0", "id": reqId, "result": result}
+
+    @staticmethod
+    def _error(reqId, code, message):
+        return {"jsonrpc": "2.0", "id": reqId, "error": {"code": code, "message": message}}
+
+    # ECU-bound methods -------------------------------------------------
+    def _flashPdx(self, pdx_path=None):
+        # the server belongs to the daemon, so it is never closed after a flash
+        with self._ecuLock:
+            return self._esys.FlashPdx(pdx_path, close_server=False)
+
+    def _uploadDataSets(self, check_modified=False):
+        with self._ecuLock:
+            self._fwlLock.acquireRead()
+            try:
+                return self._esys.UploadDataSets(check_modified)
+            finally:
+                self._fwlLock.releaseRead()
+
+    def _writeCertificate(self, certificate, keypack, svt):
+        with self._ecuLock:
+            return self._esys.WriteCertificate(certificate, keypack, svt)
+
+    # FWL methods -------------------------------------------------------
+    def _getParameter(self, name):
+        if not self._esys._localDataSets:
+            # datasets are read back from the ECU first, which rewrites the FWL files
+            with self._ecuLock:
+                self._fwlLock.acquireWrite()
+                try:
+                    return self._esys.GetParameter(name)
+                finally:
+                    self._fwlLock.releaseWrite()
+        self._fwlLock.acquireRead()
+        try:
+            return self._esys.GetParameter(name)
+        finally:
+            self._fwlLock.releaseRead()
+
+    def _setParameter(self, name, value):
+        lock = self._ecuLock if not self._esys._localDataSets else contextlib.nullcontext()
+        with lock:
+            self._fwlLock.acquireWrite()
+            try:
+                return self._esys.SetParameter(name, value)
+            finally:
+                self._fwlLock.releaseWrite()
+
+    # daemon methods ----------------------------------------------------
+    def _ping(self):
+        return True
+
+    def _shutdown(self):
+        # serve_forever must be stopped from another thread than the one serving the request
+        threading.Thread(target=self._server.shutdown, daemon=True).start()
+        return True
+
+
+class _EsysRpcServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, handler, daemon):
+        self.esysDaemon = daemon
+        super().__init__(address, handler)
+
+
+class _EsysRpcHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                response = EsysDaemon._error(None, PARSE_ERROR, "Parse error")
+            else:
+                if DEBUG:
+                    print(f"<<----- {request}")
+                response = self.server.esysDaemon.Dispatch(request)
+            if response is not None:
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+
+class EsysClient:
+    """
+    drop-in replacement for Esys in test processes that forwards the calls to a running EsysDaemon
+    """
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+        self._address = (host, port)
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._nextId = 0
+
+    def FlashPdx(self, pdx_path=None, close_server=True):
+        """
+        method used to flash full pdx; the daemon keeps its server open, close_server is ignored
+        """
+        return self._call("FlashPdx", pdx_path=pdx_path)
+
+    def UploadDataSets(self, check_modified=False):
+        """
+        method that flashes modified and signed NCD's
+        """
+        return self._call("UploadDataSets", check_modified=check_modified)
+
+    def GetParameter(self, name):
+        """
+        method used to read the parameter value from FWL file
+        """
+        return self._call("GetParameter", name=name)
+
+    def SetParameter(self, name, value):
+        """
+        method used to update the FWL files. Will NOT write the data to ECU
+        """
+        return self._call("SetParameter", name=name, value=value)
+
+    def WriteCertificate(self, certificate, keypack, svt):
+        """
+        method use to write the certificate bindings
+        """
+        return self._call("WriteCertificate", certificate=certificate, keypack=keypack, svt=svt)
+
+    def Ping(self):
+        """
+        method that returns True if the daemon is reachable
+        """
+        try:
+            return self._call("Ping")
+        except OSError:
+            return False
+
+    def Shutdown(self):
+        """
+        method that asks the daemon to close the E-Sys server and exit
+        """
+        return self._call("Shutdown")
+
+    def _call(self, method, **params):
+        with self._lock:
+            self._nextId += 1
+            reqId = self._nextId
+        request = {"jsonrpc": "2.0", "id": reqId, "method": method, "params": params}
+        with socket.create_connection(self._address, timeout=self._timeout) as sock:
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as stream:
+                line = stream.readline()
+        if not line:
+            raise Exception(f"ERROR: EsysDaemon closed the connection during '{method}'")
+        response = json.loads(line)
+        if "error" in response:
+            raise Exception(f"ERROR: EsysDaemon: {response['error']['message']}")
+        return response["result"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local E-Sys daemon sharing one warm server between test processes")
+    parser.add_argument("--config", required=True, help="JSON file with the Esys device parameters")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    with open(args.config, encoding="utf-8") as cfg:
+        config = json.load(cfg)
+    daemon = EsysDaemon(config, args.host, args.port)
+    daemon.Start()
+    print(f"EsysDaemon listening on {daemon.address[0]}:{daemon.address[1]}")
+    daemon.ServeForever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Shell-free launching of E-Sys commands.
+
+Commands are passed to the OS as argument vectors, so paths with spaces need no quoting.
+On Windows E-Sys.bat still runs in a cmd.exe of its own. The backend is picked by platform:
+
+    WindowsLauncher   runs E-Sys.bat, the server gets its own console (like 'start' did)
+    PosixLauncher     runs any executable, e.g. a stand-in server script on the Linux CI agents
+"""
+import abc
+import os
+import signal
+import subprocess
+
+
+class _Launcher(abc.ABC):
+    def Run(self, argv, stdout=None, capture=False):
+        """
+        method that runs a command to completion and returns (returncode, stdout, stderr).
+        Without 'capture' the output goes to 'stdout' (an open file) and empty strings are returned
+        """
+        if capture:
+            process = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE, text=True, **self._runOptions())
+            out, err = process.communicate()
+            return process.returncode, out, err
+        process = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=stdout, **self._runOptions())
+        process.wait()
+        return process.returncode, "", ""
+
+    async def RunAsync(self, argv, stdout=None, capture=False):
+        """
+        method like Run for asyncio: the command runs as asyncio subprocess and is killed, with what
+        it started, when the awaiting task is cancelled
+        """
+        import asyncio
+        import locale
+        if capture:
+            process = await asyncio.create_subprocess_exec(*argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                                           stderr=subprocess.PIPE, **self._runOptions())
+        else:
+            process = await asyncio.create_subprocess_exec(*argv, stdin=subprocess.DEVNULL, stdout=stdout,
+                                                           **self._runOptions())
+        try:
+            out, err = await process.communicate()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                self._kill(process)
+                await process.wait()
+            raise
+        if not capture:
+            return process.returncode, "", ""
+        # the same decoding as text=True in Run
+        encoding = locale.getpreferredencoding(False)
+        return process.returncode, out.decode(encoding, errors="replace"), err.decode(encoding, errors="replace")
+
+    def _kill(self, process):
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+    def Start(self, argv):
+        """
+        method that starts a long running command (the E-Sys server) without waiting for it
+        """
+        return subprocess.Popen(argv, stdin=subprocess.DEVNULL, **self._startOptions())
+
+    @abc.abstractmethod
+    def Stop(self, process):
+        """
+        method that makes sure a process started with Start is gone
+        """
+
+    def _runOptions(self):
+        return {}
+
+    def _startOptions(self):
+        return {}
+
+
+class WindowsLauncher(_Launcher):
+    def _startOptions(self):
+        return {"creationflags": subprocess.CREATE_NEW_CONSOLE | subprocess.CREATE_NEW_PROCESS_GROUP}
+
+    def Stop(self, process):
+        """
+        method that kills the server with everything E-Sys.bat started from it (cmd.exe, java)
+        """
+        if not process:
+            return
+        self._kill(process)
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def _kill(self, process):
+        # E-Sys.bat runs in a cmd.exe, the java process below it has to go too
+        import psutil
+        try:
+            children = psutil.Process(process.pid).children(recursive=True)
+        except psutil.Error:
+            # already gone, its children (if any) can't be found anymore
+            children = []
+        for child in children:
+            try:
+                child.kill()
+            except psutil.Error:
+                pass
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+
+class PosixLauncher(_Launcher):
+    def _runOptions(self):
+        # own session too, so a killed command goes with everything it spawned
+        return {"start_new_session": True}
+
+    def _kill(self, process):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _startOptions(self):
+        # own session, so the whole server process group can be stopped at once
+        return {"stdout": subprocess.DEVNULL, "start_new_session": True}
+
+    def Stop(self, process):
+        if not process:
+            return
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def GetLauncher():
+    """
+    returns the launcher of the current platform
+    """
+    if os.name == 'nt':
+        return WindowsLauncher()
+    return PosixLauncher()
@@ -0,0 +1,146 @@
+"""
+Per-run E-Sys logs with size based rotation and a sidecar index.
+
+Every Esys instance writes to its own run:
+
+    EsysLog_<run>_001.log.gz    rotated (compressed) segments
+    EsysLog_<run>_002.log       segment currently written
+    EsysLog_<run>.idx           one JSON line per command:
+                                {"run", "cmd", "ts", "rc", "segment", "offset", "length"}
+
+Offsets are positions in the uncompressed segment, so the output of one command is found with
+
+    for entry in EsysRunLog.Find("Reports", command="-talexecution"):
+        print(EsysRunLog.ReadOutput("Reports", entry))
+"""
+import glob
+import gzip
+import itertools
+import json
+import os
+import shutil
+import time
+
+PREFIX = "EsysLog_"
+INDEX_SUFFIX = ".idx"
+
+# several Esys instances may be created by the same process within one second
+_instanceCounter = itertools.count(1)
+
+
+class EsysRunLog:
+    def __init__(self, folder, run_id=None, max_bytes=10 * 1024 * 1024, keep_runs=50):
+        self.folder = folder
+        self.runId = run_id or f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{next(_instanceCounter)}"
+        self._maxBytes = max_bytes
+        # a run id given by the caller may already have rotated segments
+        self._segment = 1 + len(glob.glob(os.path.join(folder, f"{PREFIX}{glob.escape(self.runId)}_*.log.gz")))
+        self.indexPath = os.path.join(folder, f"{PREFIX}{self.runId}{INDEX_SUFFIX}")
+        self._pruneRuns(keep_runs)
+
+    @property
+    def path(self):
+        """
+        path of the segment currently written
+        """
+        return self._segmentPath(self.folder, self.runId, self._segment)
+
+    @staticmethod
+    def _segmentPath(folder, run_id, segment):
+        return os.path.join(folder, f"{PREFIX}{run_id}_{segment:03d}.log")
+
+    def Begin(self):
+        """
+        method that returns the log file a command writes its output to
+        """
+        log = open(self.path, 'a+')
+        log.seek(0, os.SEEK_END)
+        log.startOffset = log.tell()
+        log.startTime = time.time()
+        return log
+
+    def End(self, log, cmd, returncode):
+        """
+        method that closes the log file of a command, indexes its output and rotates the segment if needed
+        """
+        log.flush()
+        # the output was written by the child process, the file object does not know the new size
+        end = log.seek(0, os.SEEK_END)
+        log.close()
+        self._index(cmd, returncode, log.startTime, log.startOffset, end - log.startOffset)
+        if end >= self._maxBytes:
+            self._rotate()
+
+    def Write(self, cmd, returncode, text):
+        """
+        method that logs output which was not written by a child process (e.g. replayed commands)
+        """
+        log = self.Begin()
+        log.write(text)
+        self.End(log, cmd, returncode)
+
+    def _index(self, cmd, returncode, start, offset, length):
+        entry = {
+            "run": self.runId,
+            "cmd": cmd,
+            "ts": start,
+            "rc": returncode,
+            "segment": self._segment,
+            "offset": offset,
+            "length": length,
+        }
+        with open(self.indexPath, 'a', encoding="utf-8") as index:
+            index.write(json.dumps(entry) + "\n")
+
+    def _rotate(self):
+        path = self.path
+        with open(path, 'rb') as src, gzip.open(path + ".gz", 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+        self._segment += 1
+
+    def _pruneRuns(self, keep_runs):
+        """
+        method that deletes the oldest runs, keeping the newest 'keep_runs' (the current one included)
+        """
+        indexes = glob.glob(os.path.join(self.folder, f"{PREFIX}*{INDEX_SUFFIX}"))
+        indexes.sort(key=os.path.getmtime)
+        for index in indexes[:max(0, len(indexes) - keep_runs + 1)]:
+            runId = os.path.basename(index)[len(PREFIX):-len(INDEX_SUFFIX)]
+            for path in glob.glob(os.path.join(self.folder, f"{PREFIX}{glob.escape(runId)}_*.log*")) + [index]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    # a run still in use by another process on the bench
+                    pass
+
+    @staticmethod
+    def Find(folder, run=None, command=None, since=None):
+        """
+        method that yields the index entries of a log folder, optionally filtered by
+        run id, a substring of the command and a start timestamp
+        """
+        pattern = f"{PREFIX}{glob.escape(run) if run else '*'}{INDEX_SUFFIX}"
+        for index in sorted(glob.glob(os.path.join(folder, pattern)), key=os.path.getmtime):
+            with open(index, encoding="utf-8") as lines:
+                for line in lines:
+                    entry = json.loads(line)
+                    if command and command not in entry["cmd"]:
+                        continue
+                    if since and entry["ts"] < since:
+                        continue
+                    yield entry
+
+    @staticmethod
+    def ReadOutput(folder, entry):
+        """
+        method that returns the output of one indexed command
+        """
+        path = EsysRunLog._segmentPath(folder, entry["run"], entry["segment"])
+        if os.path.isfile(path):
+            log = open(path, 'rb')
+        else:
+            log = gzip.open(path + ".gz", 'rb')
+        with log:
+            log.seek(entry["offset"])
+            return log.read(entry["length"]).decode(errors="replace")
@@ -0,0 +1,143 @@
+"""
+Background resource sampling of the E-Sys server and client process trees.
+
+Enable it through the Esys device configuration:
+
+    <PARM name='monitor' value='true'/>
+    <PARM name='monitor_interval' value='1'/>          seconds between samples
+    <PARM name='monitor_rss_mb' value='1500'/>         warn above this RSS (per process tree)
+    <PARM name='monitor_handles' value='5000'/>        warn above this handle/fd count
+    <PARM name='monitor_threads' value='500'/>         warn above this thread count
+    <PARM name='monitor_format' value='csv'/>          'jsonl' (default) or 'csv'
+
+While FlashPdx/UploadDataSets run, one sample per process tree is taken every interval:
+time, phase, tree, processes, cpu %, rss (bytes), threads, handles (open handles on Windows,
+file descriptors elsewhere). Samples are kept in a ring buffer and appended to
+EsysMonitor_<run>.jsonl/.csv in the log folder when the phase ends.
+"""
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import psutil
+
+FIELDS = ("time", "phase", "tree", "processes", "cpu", "rss", "threads", "handles")
+
+
+class ResourceSampler:
+    """
+    samples the process trees returned by 'roots' (a callable returning {tree name: [root pids]})
+    """
+    def __init__(self, roots, path, interval=1.0, capacity=36000, thresholds=None):
+        self._roots = roots
+        self.path = path
+        self._interval = interval
+        self._thresholds = thresholds or {}
+        self.samples = deque(maxlen=capacity)
+        self._processes = {}
+        self._phase = None
+        self._warned = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def Start(self, phase):
+        """
+        method that starts sampling in a background thread
+        """
+        if self._thread:
+            return
+        self._phase = phase
+        self._warned.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"EsysMonitor-{phase}", daemon=True)
+        self._thread.start()
+
+    def Stop(self):
+        """
+        method that stops sampling and appends the new samples to the run file
+        """
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._sample()
+        self.Flush()
+
+    def Flush(self):
+        """
+        method that moves the buffered samples to the run file
+        """
+        samples = []
+        while self.samples:
+            samples.append(self.samples.popleft())
+        if not samples:
+            return
+        newFile = not os.path.isfile(self.path)
+        with open(self.path, 'a', newline='', encoding="utf-8") as out:
+            if self.path.endswith(".csv"):
+                writer = csv.writer(out)
+                if newFile:
+                    writer.writerow(FIELDS)
+                writer.writerows(samples)
+            else:
+                for sample in samples:
+                    out.write(json.dumps(dict(zip(FIELDS, sample))) + "\n")
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self._sample()
+
+    def _sample(self):
+        now = time.time()
+        # the server is a child of the client process, each process is only counted in the first tree
+        seen = set()
+        for tree, pids in self._roots().items():
+            cpu = rss = threads = handles = count = 0
+            for process in self._tree(pids):
+                if process.pid in seen:
+                    continue
+                seen.add(process.pid)
+                try:
+                    with process.oneshot():
+                        cpu += process.cpu_percent()
+                        rss += process.memory_info().rss
+                        threads += process.num_threads()
+                        handles += process.num_handles() if os.name == 'nt' else process.num_fds()
+                    count += 1
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    continue
+            sample = (now, self._phase, tree, count, round(cpu, 1), rss, threads, handles)
+            self.samples.append(sample)
+            self._checkThresholds(tree, rss, threads, handles)
+
+    def _tree(self, pids):
+        """
+        returns the processes of the trees below 'pids', reusing the psutil objects
+        so cpu_percent measures the time since the previous sample
+        """
+        processes = []
+        for pid in pids:
+            try:
+                root = self._process(pid)
+                processes.append(root)
+                processes.extend(self._process(child.pid) for child in root.children(recursive=True))
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return processes
+
+    def _process(self, pid):
+        process = self._processes.get(pid)
+        if process is None or not process.is_running():
+            process = self._processes[pid] = psutil.Process(pid)
+        return process
+
+    def _checkThresholds(self, tree, rss, threads, handles):
+        values = {"rss_mb": rss / (1024 * 1024), "threads": threads, "handles": handles}
+        for name, limit in self._thresholds.items():
+            if limit and values[name] > limit and (tree, name) not in self._warned:
+                self._warned.add((tree, name))
+                print(f"WARNING: Esys monitor: {tree} {name} {values[name]:.0f} exceeds {limit} during {self._phase}")
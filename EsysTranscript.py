@@ -0,0 +1,221 @@
+"""
+Record/replay of E-Sys command transcripts.
+
+A transcript archive is a zip file:
+
+    meta.json               recording time and the placeholders used below
+    commands/000001.json    one record per command: argument vector, return code, output, timing,
+                            referenced config files and files produced by the command (its '-out'
+                            target and the output folders named in its config files, e.g. the
+                            NCD_DIR of '-fwl2Ncd' and the SIGNED_NCD_DIR of '-signNcd')
+    blobs/<sha1>            content of those files, stored once per distinct content
+
+Paths are stored with placeholders ($ROOT, $APP, $LOG) instead of the bench folders, so a
+session recorded on a bench can be replayed on any machine with its own folders.
+
+Enable it through the Esys device configuration:
+
+    <PARM name='record' value='flash_session.zip'/>         record every E-Sys command
+    <PARM name='replay' value='flash_session.zip'/>         answer E-Sys commands from a transcript
+    <PARM name='replay_speed' value='0'/>                   1 = recorded timing, 10 = 10x faster, 0 = no delay
+"""
+import atexit
+import configparser
+import hashlib
+import json
+import os
+import time
+import zipfile
+
+
+def _sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _PathMapper:
+    """
+    replaces bench specific folders with placeholders and back
+    """
+    def __init__(self, substitutions):
+        # longest folders first, so '$LOG' inside '$ROOT' is not cut in half
+        self._subs = sorted(
+            ((key, os.path.normpath(value)) for key, value in substitutions.items() if value),
+            key=lambda item: len(item[1]),
+            reverse=True,
+        )
+
+    def toTranscript(self, text):
+        for key, value in self._subs:
+            for variant in {value, value.replace("\\", "/"), value.replace("/", "\\")}:
+                text = text.replace(variant, key)
+        return text
+
+    def fromTranscript(self, text):
+        for key, value in self._subs:
+            text = text.replace(key, value)
+        return text
+
+
+def _configOutputs(path):
+    """
+    returns the folders a config file names as output ('..._DIR' keys, like NCD_DIR or SIGNED_NCD_DIR)
+    """
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    try:
+        config.read(path, encoding="utf-8")
+    except (configparser.Error, UnicodeDecodeError):
+        return []
+    return [value for section in config.sections() for key, value in config[section].items()
+            if key.endswith("_DIR") and value]
+
+
+def _commandFiles(args):
+    """
+    returns the config files referenced by a command and its output targets ('-out' and the
+    output folders of the configs)
+    """
+    configs = [arg for arg in args if arg.endswith(".config") and os.path.isfile(arg)]
+    outputs = [folder for path in configs for folder in _configOutputs(path)]
+    if "-out" in args:
+        index = args.index("-out") + 1
+        if index < len(args):
+            outputs.append(args[index])
+    return configs, outputs
+
+
+class TranscriptRecorder:
+    """
+    appends every executed E-Sys command to a transcript archive.
+    The archive stays open while recording and is completed by close() (at the latest on exit)
+    """
+    def __init__(self, archive_path, substitutions):
+        self.path = archive_path
+        self._mapper = _PathMapper(substitutions)
+        self._count = 0
+        self._blobs = set()
+        folder = os.path.dirname(archive_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._archive = zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED)
+        meta = {"created": time.time(), "placeholders": sorted(substitutions)}
+        self._archive.writestr("meta.json", json.dumps(meta))
+        atexit.register(self.close)
+
+    def close(self):
+        """
+        method that writes the archive directory, the transcript can be replayed from then on
+        """
+        if self._archive:
+            self._archive.close()
+            self._archive = None
+            atexit.unregister(self.close)
+
+    def record(self, cmd, returncode, stdout, stderr, start, duration):
+        """
+        method that stores one executed command (argument vector);
+        'start' is the wall clock time the command was launched
+        """
+        if not self._archive:
+            return
+        self._count += 1
+        configs, outputs = _commandFiles(cmd)
+        produced = {}
+        for out in outputs:
+            for path in self._producedFiles(out, start):
+                produced[self._mapper.toTranscript(path)] = self._addBlob(path)
+        record = {
+            "argv": [self._mapper.toTranscript(arg) for arg in cmd],
+            "returncode": returncode,
+            "stdout": stdout or "",
+            "stderr": stderr or "",
+            "start": start,
+            "duration": duration,
+            "configs": {self._mapper.toTranscript(path): self._addBlob(path) for path in configs},
+            "produced": produced,
+        }
+        self._archive.writestr(f"commands/{self._count:06d}.json", json.dumps(record))
+
+    @staticmethod
+    def _producedFiles(out, start):
+        if os.path.isfile(out):
+            return [out]
+        # only what the command (re)wrote, not what was already in the output folder;
+        # sub folders included ('-signNcd' writes into SIGNED_NCD_DIR/<VIN>)
+        produced = []
+        for root, _, names in os.walk(out):
+            for name in names:
+                path = os.path.join(root, name)
+                if os.path.getmtime(path) >= start - 1:
+                    produced.append(path)
+        return produced
+
+    def _addBlob(self, path):
+        sha = _sha1(path)
+        if sha not in self._blobs:
+            self._archive.write(path, f"blobs/{sha}")
+            self._blobs.add(sha)
+        return sha
+
+
+class TranscriptReplayer:
+    """
+    answers E-Sys commands from a recorded transcript instead of running them.
+
+    Commands are matched in recorded order; a command may skip ahead in the transcript
+    (e.g. fewer '-server -check' polls than recorded) and repeated queries reuse their last answer.
+    Config files that differ from the recorded ones are collected in 'mismatches'.
+    """
+    def __init__(self, archive_path, substitutions, speed=1.0):
+        self.path = archive_path
+        self._mapper = _PathMapper(substitutions)
+        self._speed = speed
+        self._position = 0
+        self._lastAnswer = {}
+        self.mismatches = []
+        if not os.path.isfile(archive_path):
+            raise Exception(f"ERROR: Esys transcript not found: {archive_path}")
+        with zipfile.ZipFile(archive_path) as archive:
+            names = sorted(name for name in archive.namelist() if name.startswith("commands/"))
+            self._records = [json.loads(archive.read(name)) for name in names]
+
+    def execute(self, cmd):
+        """
+        method that returns (returncode, stdout, stderr) of the recorded command
+        and restores the files it produced
+        """
+        record = self._nextRecord([self._mapper.toTranscript(arg) for arg in cmd])
+        if record is None:
+            raise Exception(f"ERROR: Esys replay: command not found in transcript: {cmd}")
+
+        for path, sha in record["configs"].items():
+            path = self._localPath(path)
+            if not os.path.isfile(path) or _sha1(path) != sha:
+                self.mismatches.append((cmd, path))
+        if record["produced"]:
+            with zipfile.ZipFile(self.path) as archive:
+                for path, sha in record["produced"].items():
+                    path = self._localPath(path)
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                    with open(path, "wb") as f:
+                        f.write(archive.read(f"blobs/{sha}"))
+
+        if self._speed:
+            time.sleep(record["duration"] / self._speed)
+        return record["returncode"], record["stdout"], record["stderr"]
+
+    def _localPath(self, path):
+        # a transcript recorded on Windows may be replayed on Linux and the other way round
+        return os.path.normpath(self._mapper.fromTranscript(path).replace("\\", "/"))
+
+    def _nextRecord(self, argv):
+        for index in range(self._position, len(self._records)):
+            if self._records[index]["argv"] == argv:
+                self._position = index + 1
+                self._lastAnswer[tuple(argv)] = self._records[index]
+                return self._records[index]
+        return self._lastAnswer.get(tuple(argv))
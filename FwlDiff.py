@@ -0,0 +1,187 @@
+"""
+Diff engine for FWL dataset trees (the files in ncd/default, ncd/datasets or a '-readNcd' output).
+
+Every FWL line has the format parsed by Esys._getParameter:
+
+    AccRunningModeActivateSupress:SensData_G70[255]
+    <parameter name>:<data id>[<value>]
+
+A tree is loaded into columns (name, data id, value, file) and two trees are compared in bulk:
+parameters only in the new tree are 'added', only in the old one 'removed', and parameters whose
+data id or value differ are 'changed'. For multi byte values (hex blocks like [01,02,FF] or
+[0x01 0x02]) the differing byte positions are listed.
+
+Usage:
+
+    python FwlDiff.py ncd/default ncd/datasets [ncd/ecu] [-o report.json]
+
+With a third tree the report holds both 'default -> datasets' and 'datasets -> ecu'.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+_TOKEN_SEP = re.compile(r"[,\s]+")
+
+
+class FwlTable:
+    """
+    columnar view of all parameters of one FWL tree
+    """
+    def __init__(self, label=""):
+        self.label = label
+        self.names = []
+        self.dataIds = []
+        self.values = []
+        self.files = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def Load(cls, path, label=None):
+        """
+        method that loads every *.fwl file of a folder (or a single file)
+        """
+        table = cls(label or path)
+        if os.path.isdir(path):
+            files = sorted(entry.path for entry in os.scandir(path) if entry.name.endswith(".fwl"))
+        else:
+            files = [path]
+        for fwlFile in files:
+            with open(fwlFile, encoding="utf-8") as fwl:
+                table._addLines(fwl.read().splitlines(), os.path.basename(fwlFile))
+        return table
+
+    def _addLines(self, lines, fileName):
+        names, dataIds, values, files, index = self.names, self.dataIds, self.values, self.files, self.index
+        for line in lines:
+            name, sep, rest = line.partition(":")
+            if not sep:
+                continue
+            data, sep, value = rest.partition("[")
+            if not sep:
+                continue
+            name = name.strip()
+            if name in index:
+                # same lookup rule as Esys._getParameter: the first occurrence wins
+                continue
+            index[name] = len(names)
+            names.append(name)
+            dataIds.append(data.strip())
+            values.append(value.rstrip().rstrip("]").strip())
+            files.append(fileName)
+
+
+def _tokens(value):
+    return [token for token in _TOKEN_SEP.split(value) if token]
+
+
+def _normalizeToken(token):
+    token = token.lower()
+    if token.startswith("0x"):
+        token = token[2:]
+    return token.lstrip("0") or "0"
+
+
+def ByteDiff(old, new):
+    """
+    returns the differing byte positions of two hex block values as [{index, old, new}]
+    (None when the values are single values)
+    """
+    oldTokens = _tokens(old)
+    newTokens = _tokens(new)
+    if len(oldTokens) < 2 and len(newTokens) < 2:
+        return None
+    diff = []
+    for index in range(max(len(oldTokens), len(newTokens))):
+        a = oldTokens[index] if index < len(oldTokens) else None
+        b = newTokens[index] if index < len(newTokens) else None
+        if a is None or b is None or _normalizeToken(a) != _normalizeToken(b):
+            diff.append({"index": index, "old": a, "new": b})
+    return diff
+
+
+def Diff(old, new):
+    """
+    method that compares two FwlTables and returns a report dict
+    """
+    oldIndex, newIndex = old.index, new.index
+    oldNames, newNames = oldIndex.keys(), newIndex.keys()
+
+    added = sorted(newNames - oldNames)
+    removed = sorted(oldNames - newNames)
+
+    # bulk compare: rows of the old tree that do not exist unchanged in the new one,
+    # restricted to the names present in both trees
+    oldRows = set(zip(old.names, old.dataIds, old.values))
+    newRows = set(zip(new.names, new.dataIds, new.values))
+    changedNames = sorted({row[0] for row in oldRows - newRows} & newNames)
+    oldData, oldValues = old.dataIds, old.values
+    newData, newValues = new.dataIds, new.values
+
+    changed = []
+    for name in changedNames:
+        i, j = oldIndex[name], newIndex[name]
+        entry = {
+            "name": name,
+            "file": new.files[j],
+            "old": {"data": oldData[i], "value": oldValues[i]},
+            "new": {"data": newData[j], "value": newValues[j]},
+        }
+        byteDiff = ByteDiff(oldValues[i], newValues[j])
+        if byteDiff is not None:
+            if not byteDiff and oldData[i] == newData[j]:
+                # same bytes, only the notation differs
+                continue
+            entry["bytes"] = byteDiff
+        changed.append(entry)
+
+    return {
+        "old": old.label,
+        "new": new.label,
+        "summary": {"added": len(added), "removed": len(removed), "changed": len(changed)},
+        "added": [_row(new, name) for name in added],
+        "removed": [_row(old, name) for name in removed],
+        "changed": changed,
+    }
+
+
+def _row(table, name):
+    i = table.index[name]
+    return {"name": name, "file": table.files[i], "data": table.dataIds[i], "value": table.values[i]}
+
+
+def Compare(*paths, labels=None):
+    """
+    method that loads two or three trees and diffs each one against the previous one
+    """
+    labels = labels or [os.path.basename(os.path.normpath(path)) for path in paths]
+    tables = [FwlTable.Load(path, label) for path, label in zip(paths, labels)]
+    return {
+        "diffs": [Diff(tables[index - 1], tables[index]) for index in range(1, len(tables))],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare FWL dataset trees")
+    parser.add_argument("trees", nargs="+", help="two or three FWL folders (or files), oldest first")
+    parser.add_argument("-o", "--output", help="report file (default: stdout)")
+    args = parser.parse_args(argv)
+    if not 2 <= len(args.trees) <= 3:
+        parser.error("two or three trees are required")
+
+    report = Compare(*args.trees)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
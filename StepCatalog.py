@@ -0,0 +1,1671 @@
+"""
+Step extraction for the MAIA test step selector, without any GUI dependency.
+
+A file is parsed once into a FileInfo (import maps, PascalCase functions, classes with their
+PascalCase methods and base names). FileInfos are cached by path and revalidated with
+(mtime, size), so expanding, checking and unchecking nodes never parse a file twice.
+
+With a cache_path the FileInfos are also kept in a SQLite file across sessions. A file whose
+(mtime, size) changed but whose content hash did not (checkout, copy) is not parsed again either.
+
+The installed tal library only changes with an upgrade: its parse results are kept in a prebuilt
+LibIndex (one JSON file per installed version, or shipped with the package) that loads in
+milliseconds. Build one with
+
+    python StepCatalog.py --build-lib-index [--lib ...\\site-packages\\tal] [-o step_index.json]
+
+WorkspaceWatcher reports edited files while the selector runs; StepCatalog.refresh re-parses only
+those and returns them together with the files of the classes inheriting from them.
+
+Headless export of the whole catalog as JSON Lines (one step per line), e.g. in CI:
+
+    python StepCatalog.py ...\\Workspaces\\<project> -o steps.jsonl --exclude "Obsolete/*"
+"""
+import argparse
+import ast
+import bisect
+import fnmatch
+import hashlib
+import heapq
+import json
+import os
+import platform
+import queue
+import re
+import select
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+# tal inside Lib/site-packages of the running python
+DEFAULT_LIB_ROOT = os.path.join(os.path.dirname(sys.executable), "Lib", "site-packages", "tal")
+# prebuilt LibIndex shipped inside the library folder (see --build-lib-index)
+LIB_INDEX_NAME = "step_index.json"
+
+# folder/file names the workspace walker skips (fnmatch, case sensitive); more can be added through
+# MAIA_STEP_IGNORE, separated by os.pathsep, e.g. "build;dist;Archive*" for build outputs and archives
+DEFAULT_IGNORE = ("__pycache__", ".*", "venv", "*.egg-info", "node_modules") + tuple(
+    pattern for pattern in os.environ.get("MAIA_STEP_IGNORE", "").split(os.pathsep) if pattern
+)
+
+
+class StepRecord:
+    """
+    one PascalCase function/method of a file: name, parameter string and docstring
+    """
+    __slots__ = ("name", "params", "doc")
+
+    def __init__(self, name, params, doc):
+        self.name = name
+        self.params = params
+        self.doc = doc
+
+
+class ClassInfo:
+    __slots__ = ("name", "methods", "bases")
+
+    def __init__(self, name, methods, bases):
+        self.name = name
+        self.methods = methods  # [StepRecord]
+        self.bases = bases      # base class names (plain names only, like 'DiagnosisInterface')
+
+
+class FileInfo:
+    """
+    parse result of one python file.
+    'items' keeps the module level functions (StepRecord) and classes (ClassInfo) in file order
+    """
+    __slots__ = ("path", "stamp", "digest", "items", "tal_imports", "proj_imports", "util_imports")
+
+    def __init__(self, path, stamp, digest=None):
+        self.path = path
+        self.stamp = stamp
+        self.digest = digest
+        self.items = []
+        self.tal_imports = {}
+        self.proj_imports = {}
+        self.util_imports = {}
+
+    def classes(self, name):
+        return [item for item in self.items if isinstance(item, ClassInfo) and item.name == name]
+
+    def to_json(self):
+        items = []
+        for item in self.items:
+            if isinstance(item, StepRecord):
+                items.append(["f", item.name, item.params, item.doc])
+            else:
+                methods = [[m.name, m.params, m.doc] for m in item.methods]
+                items.append(["c", item.name, methods, item.bases])
+        return json.dumps({
+            "items": items,
+            "tal": self.tal_imports,
+            "proj": self.proj_imports,
+            "util": self.util_imports,
+        })
+
+    @classmethod
+    def from_json(cls, path, stamp, digest, text):
+        data = json.loads(text)
+        info = cls(path, stamp, digest)
+        for item in data["items"]:
+            if item[0] == "f":
+                info.items.append(StepRecord(*item[1:]))
+            else:
+                info.items.append(ClassInfo(item[1], [StepRecord(*m) for m in item[2]], item[3]))
+        info.tal_imports = {k: tuple(v) for k, v in data["tal"].items()}
+        info.proj_imports = {k: tuple(v) for k, v in data["proj"].items()}
+        info.util_imports = {k: tuple(v) for k, v in data["util"].items()}
+        return info
+
+
+def is_camel_step(name: str) -> bool:
+    """
+    Keep only names like 'BatterySetVoltage':
+    - start with uppercase
+    - no underscores
+    """
+    if not name:
+        return False
+    if not name[0].isupper():
+        return False
+    if "_" in name:
+        return False
+    return True
+
+
+def is_dunder(name):
+    return name.startswith("__") and name.endswith("__")
+
+
+def file_stamp(path):
+    """
+    (mtime, size) of a file, None when it does not exist
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def entry_stamp(entry):
+    """
+    (mtime, size) of an os.DirEntry, from the data the directory listing already returned where possible
+    """
+    try:
+        st = entry.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def read_source(path):
+    """
+    (bytes, sha1) of a file, (None, None) when it cannot be read
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None, None
+    return data, hashlib.sha1(data).hexdigest()
+
+
+def parse_file(path, stamp=None, data=None, digest=None) -> FileInfo:
+    """
+    Parse a python file into a FileInfo. Unreadable files and syntax errors give an empty FileInfo.
+    """
+    if data is None:
+        data, digest = read_source(path)
+    info = FileInfo(path, stamp if stamp is not None else file_stamp(path), digest)
+    try:
+        tree = ast.parse(data.decode("utf-8"))
+    except (AttributeError, UnicodeDecodeError, SyntaxError, ValueError):
+        return info
+
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module:
+            if node.module.startswith("tal"):
+                target = info.tal_imports
+            elif node.module.startswith("ProjectComponents."):
+                target = info.proj_imports
+            elif node.module.startswith("Utility."):
+                target = info.util_imports
+            else:
+                continue
+            for alias in node.names:
+                target[alias.asname or alias.name] = (node.module, alias.name)
+
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            # keep only CamelCase / PascalCase style
+            if not is_dunder(node.name) and is_camel_step(node.name):
+                info.items.append(_record(node))
+        elif isinstance(node, ast.ClassDef):
+            methods = [
+                _record(func)
+                for func in node.body
+                if isinstance(func, ast.FunctionDef) and not is_dunder(func.name) and is_camel_step(func.name)
+            ]
+            bases = [base.id for base in node.bases if isinstance(base, ast.Name)]
+            info.items.append(ClassInfo(node.name, methods, bases))
+    return info
+
+
+# lexical pre-scan: module level defs/classes (no indent) and the defs directly in a class body
+_SCAN_DEF = re.compile(rb"^([ \t]*)(?:def[ \t]+(\w+)|class[ \t]+\w+[ \t]*(?:\(([^)]*)\))?)", re.M)
+_SCAN_BODY = re.compile(rb"[^\n]*\n(?:[ \t]*(?:#[^\n]*)?\n)*([ \t]*)")
+_SCAN_IMPORT = re.compile(rb"^from[ \t]+(?:tal|ProjectComponents|Utility)\b[\w.]*[ \t]+import[ \t]+(\([^)]*\)|[^\n]*)", re.M)
+
+
+def scan_step_hint(data) -> bool:
+    """
+    Lexical pre-scan of a source (bytes): may it define steps? Same rules as parse_file without
+    building an AST: a PascalCase module level function, a PascalCase method of a module level
+    class, or a module level class with a base imported from tal / ProjectComponents / Utility
+    (or DiagnosisInterface). Code inside multi line strings can give a false positive.
+    """
+    step_bases = {b"DiagnosisInterface"}
+    for match in _SCAN_IMPORT.finditer(data):
+        for name in match.group(1).split(b"#")[0].strip(b"()").split(b","):
+            words = name.split()
+            if words:
+                # 'Name as Alias' -> Alias
+                step_bases.add(words[-1])
+
+    in_class = False
+    member_indent = None
+    for match in _SCAN_DEF.finditer(data):
+        indent, name, bases = match.groups()
+        if not indent:
+            if name is not None:
+                in_class = False
+                if is_camel_step(name.decode("ascii", "replace")):
+                    return True
+            else:
+                # the indentation of the first line of the body (the docstring is one, too)
+                body = _SCAN_BODY.match(data, match.end())
+                member_indent = body.group(1) if body else None
+                in_class = bool(member_indent)
+                if bases and any(base.strip() in step_bases for base in bases.split(b",")):
+                    return True
+        elif in_class:
+            # deeper defs are nested (or example code in a docstring)
+            if indent == member_indent and name is not None and is_camel_step(name.decode("ascii", "replace")):
+                return True
+    return False
+
+
+def _record(node):
+    return StepRecord(node.name, param_string(node), ast.get_docstring(node) or "")
+
+
+def param_string(node):
+    args = node.args
+    parts = []
+
+    pos_args = args.args[:]
+    if pos_args and pos_args[0].arg in ("self", "cls"):
+        pos_args = pos_args[1:]
+
+    defaults = args.defaults or []
+    num_pos = len(pos_args)
+    num_def = len(defaults)
+
+    for i, arg in enumerate(pos_args):
+        name = arg.arg
+        default_str = None
+        if i >= num_pos - num_def:
+            default_node = defaults[i - (num_pos - num_def)]
+            default_str = expr_to_str(default_node)
+        if default_str:
+            parts.append(f"{name}={default_str}")
+        else:
+            parts.append(name)
+
+    if args.vararg:
+        parts.append(f"*{args.vararg.arg}")
+
+    for kwarg, default in zip(args.kwonlyargs, args.kw_defaults):
+        name = kwarg.arg
+        if default is not None:
+            parts.append(f"{name}={expr_to_str(default)}")
+        else:
+            parts.append(name)
+
+    if args.kwarg:
+        parts.append(f"**{args.kwarg.arg}")
+
+    return "(" + ", ".join(parts) + ")"
+
+
+def expr_to_str(node):
+    if not node:
+        return ""
+    try:
+        if hasattr(ast, "unparse"):
+            return ast.unparse(node)
+    except Exception:
+        pass
+    if isinstance(node, ast.Constant):
+        return repr(node.value)
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return f"{expr_to_str(node.value)}.{node.attr}"
+    return "<expr>"
+
+
+def make_entry(module, record, source_path):
+    # the folder is not part of the final name
+    return {
+        "test_step_definition": f"{module}.{record.name}{record.params}",
+        "test_step_description": record.doc,
+        "source_path": source_path,
+    }
+
+
+def diagnosis_type_to_class(diag_type: str) -> Optional[str]:
+    """
+    Map 'uds.symbolic' -> 'UdsSymbolic', etc.
+    Extend this mapping as needed.
+    """
+    if not diag_type:
+        return None
+    diag_type = diag_type.strip().lower()
+    mapping = {
+        "uds.symbolic": "UdsSymbolic",
+        "uds.raw": "UdsRaw",
+        "uds.obd": "UdsObd",
+        "uds.odis": "UdsOdis",
+        "uds.odibas": "UdsOdibas",
+    }
+    return mapping.get(diag_type)
+
+
+def find_devices_cfgs(workspace_root, station=None) -> list[str]:
+    """
+    Return the best matching *_devices.cfg under <workspace_root>/Config/Devices.
+
+    Preference order:
+    1. <station>_devices.cfg   (where <station> is the platform/host name by default)
+    2. devices.cfg / device.cfg
+    3. (optional) nothing -> caller will treat as not resolved
+    """
+    if not workspace_root:
+        return []
+
+    devices_dir = os.path.join(workspace_root, "Config", "Devices")
+    if not os.path.isdir(devices_dir):
+        return []
+
+    # All .cfg files in Devices folder
+    all_cfgs = [f for f in os.listdir(devices_dir) if f.lower().endswith(".cfg")]
+    if not all_cfgs:
+        # stderr: stdout may carry the exported catalog
+        print(f"[DiagResolution] No .cfg files found in {devices_dir}", file=sys.stderr)
+        return []
+
+    # 1) Try station-specific: <station>_devices.cfg
+    station = (station or platform.node()).lower()  # e.g. 'iads197n'
+    selected: list[str] = []
+
+    if station:
+        wanted = f"{station}_devices.cfg"
+        for name in all_cfgs:
+            if name.lower() == wanted:
+                selected.append(os.path.join(devices_dir, name))
+                break  # exact match, we’re done
+
+    # 2) Fallback to generic devices.cfg / device.cfg
+    if not selected:
+        for generic in ("devices.cfg", "device.cfg"):
+            for name in all_cfgs:
+                if name.lower() == generic:
+                    selected.append(os.path.join(devices_dir, name))
+                    break
+            if selected:
+                break
+
+    # 3) If still nothing → report and let caller treat as "not resolved"
+    if not selected:
+        print(
+            f"[DiagResolution] No matching devices cfg found for station "
+            f"'{station}' in {devices_dir}. "
+            "Expected '<station>_devices.cfg' or 'devices.cfg'/'device.cfg'.",
+            file=sys.stderr,
+        )
+        return []
+
+    return selected
+
+
+def resolve_diag_impl(workspace_root, station=None) -> Optional[Tuple[str, str, str]]:
+    """
+    Inspect *_devices.cfg and return ('tal.FunctionalComponents.Diagnosis.DiagnosisInterface', '<ClassName>',
+    '<raw type>') for the TAL-DEVICE named 'DiagnosisInterface', None when it is not configured.
+    """
+    for cfg in find_devices_cfgs(workspace_root, station):
+        try:
+            tree = ET.parse(cfg)
+            root = tree.getroot()
+        except Exception:
+            continue
+
+        # Find TAL-DEVICE with name='DiagnosisInterface'
+        for dev in root.findall(".//TAL-DEVICE"):
+            name = dev.get("name") or dev.get("NAME") or ""
+            if name.strip().lower() != "diagnosisinterface":
+                continue
+
+            diag_type = dev.get("type") or dev.get("TYPE") or ""
+            cls = diagnosis_type_to_class(diag_type)
+            if not cls:
+                # Try looking for a PARM like <PARM name="type" value="uds.symbolic"/>
+                for p in dev.findall(".//PARM"):
+                    if (p.get("name") or "").strip().lower() == "type":
+                        cls = diagnosis_type_to_class(p.get("value") or "")
+                        if cls:
+                            break
+            if cls:
+                # UDS classes are in tal.FunctionalComponents.Diagnosis.DiagnosisInterface
+                return "tal.FunctionalComponents.Diagnosis.DiagnosisInterface", cls, diag_type.strip()
+
+    # nothing found
+    return None
+
+
+class StepCatalog:
+    """
+    Cached step extraction for a workspace:
+
+        project_root    ...\\Workspaces\\<project>\\ProjectComponents
+        workspace_root  ...\\Workspaces\\<project>        (Utility.* modules live here)
+        lib_root        site-packages\\tal
+
+    'diag_resolver' returns the (module, class) implementing 'DiagnosisInterface', or None.
+    'cache_path' is the SQLite file that keeps the parse results between sessions (optional).
+    """
+
+    def __init__(self, lib_root, project_root=None, workspace_root=None,
+                 diag_resolver: Optional[Callable[[], Optional[Tuple[str, str]]]] = None,
+                 cache_path=None, lib_index=None):
+        self.lib_root = lib_root
+        self.project_root = project_root
+        self.workspace_root = workspace_root
+        self.diag_resolver = diag_resolver
+        self._files = {}  # path -> FileInfo
+        self._hints = {}  # path -> ((mtime, size), result of the lexical pre-scan)
+        self._store = CatalogStore(cache_path) if cache_path else None
+        self.lib_index = lib_index  # prebuilt parse results of lib_root (LibIndex), optional
+        # class index, a class is keyed by (file path, class name)
+        self._class_order = {}  # key -> keys of the class and all its bases, in lookup order
+        self._class_steps = {}  # key -> ((StepRecord, source path), ...) shared by all subclasses
+        self._dependents = {}   # key -> keys of the classes that inherit from it directly
+
+    # cache ---------------------------------------------------
+    def file_info(self, path) -> FileInfo:
+        """
+        Return the FileInfo of a file, parsing it only when it is new or changed on disk.
+        """
+        stamp = file_stamp(path)
+        info = self.cached(path, stamp)
+        if info is not None:
+            return info
+        if self._store or self.lib_index is not None:
+            data, digest = read_source(path)
+            info = self.lib_index.load_digest(path, stamp, digest) if self.lib_index is not None else None
+            if info is None and self._store:
+                info = self._store.load_digest(path, stamp, digest)
+            if info is None:
+                info = parse_file(path, stamp, data, digest)
+                if self._store:
+                    self._store.save(info)
+        else:
+            info = parse_file(path, stamp)
+        self._remember(info)
+        return info
+
+    def cached(self, path, stamp=None):
+        """
+        Return the FileInfo of a file if it is known and unchanged (memory or cache file), else None.
+        """
+        if stamp is None:
+            stamp = file_stamp(path)
+        info = self._files.get(path)
+        if info is not None and info.stamp == stamp:
+            return info
+        if self.lib_index is not None:
+            info = self.lib_index.load(path, stamp)
+            if info is not None:
+                self._remember(info)
+                return info
+        if self._store:
+            info = self._store.load(path, stamp)
+            if info is not None:
+                self._remember(info)
+                return info
+        return None
+
+    def put(self, info):
+        """
+        Take over a FileInfo parsed elsewhere (e.g. by the CatalogIndexer workers).
+        """
+        self._remember(info)
+        if self._store:
+            self._store.save(info)
+
+    def known_stamps(self):
+        """
+        {path: (mtime, size)} of every file with a parse result, to find the stale ones without parsing.
+        """
+        stamps = self.lib_index.stamps() if self.lib_index is not None else {}
+        if self._store:
+            stamps.update(self._store.stamps())
+        stamps.update((path, info.stamp) for path, info in self._files.items())
+        return stamps
+
+    def _remember(self, info):
+        if info.path in self._files:
+            self._invalidate_classes(info.path)
+        self._files[info.path] = info
+
+    def flush(self):
+        """
+        Write pending parse results to the cache file.
+        """
+        if self._store:
+            self._store.commit()
+
+    def close(self):
+        if self._store:
+            self._store.close()
+            self._store = None
+
+    def invalidate(self, path=None):
+        """
+        Drop one file (or everything) from the cache.
+        """
+        if path is None:
+            self._files.clear()
+            self._hints.clear()
+            self.reset_classes()
+        else:
+            self._files.pop(path, None)
+            self._invalidate_classes(path)
+
+    def refresh(self, paths):
+        """
+        Take changed files or folders (created, modified, deleted, moved) into account: changed files
+        are parsed again, deleted ones dropped. Returns the files whose steps may have changed, i.e.
+        the changed files and the files of every class inheriting from one of their classes.
+        """
+        changed = set()
+        for path in paths:
+            if os.path.isdir(path):
+                for entry in scan_python_files(path):
+                    info = self._files.get(entry.path)
+                    if info is None or info.stamp != entry_stamp(entry):
+                        changed.add(entry.path)
+            elif path.endswith(".py"):
+                changed.add(path)
+            # files of a deleted (or moved away) folder
+            prefix = os.path.join(path, "")
+            changed.update(known for known in self._files if known.startswith(prefix) and not os.path.isfile(known))
+
+        affected = set(changed)
+        for path in changed:
+            affected.update(key[0] for key in self._invalidate_classes(path))
+            self._files.pop(path, None)
+            if os.path.isfile(path):
+                self.file_info(path)
+            elif self._store:
+                self._store.save(FileInfo(path, None))
+        return affected
+
+    def reset_classes(self):
+        """
+        Forget the resolved class hierarchy (roots or the DiagnosisInterface implementation changed).
+        """
+        self._class_order.clear()
+        self._class_steps.clear()
+        self._dependents.clear()
+
+    def _invalidate_classes(self, path):
+        """
+        Drop the resolved steps of the classes of a file and of every class inheriting from them.
+        Returns the dropped class keys.
+        """
+        stack = [key for key in self._class_order if key[0] == path]
+        stack.extend(key for key in self._dependents if key[0] == path)
+        dropped = set()
+        while stack:
+            key = stack.pop()
+            if key in dropped:
+                continue
+            dropped.add(key)
+            self._class_order.pop(key, None)
+            self._class_steps.pop(key, None)
+            stack.extend(self._dependents.get(key, ()))
+        return dropped
+
+    # extraction ----------------------------------------------
+    def may_have_steps(self, path, stamp=None):
+        """
+        Cheap 'is this file worth listing': True when it has PascalCase functions/methods or a class
+        with a step base (imported from tal / ProjectComponents / Utility, DiagnosisInterface).
+        Answered from the parse result when it is in memory, else from a lexical pre-scan of the
+        source (see scan_step_hint) that is remembered per (mtime, size). No AST is built.
+        """
+        if stamp is None:
+            stamp = file_stamp(path)
+        info = self._files.get(path)
+        if info is not None and info.stamp == stamp:
+            return any(
+                isinstance(item, StepRecord)
+                or item.methods
+                or any(self._base_has_steps(info, base) for base in item.bases)
+                for item in info.items
+            )
+        hint = self._hints.get(path)
+        if hint is not None and hint[0] == stamp:
+            return hint[1]
+        data, _ = read_source(path)
+        result = data is not None and scan_step_hint(data)
+        self._hints[path] = (stamp, result)
+        return result
+
+    def _base_has_steps(self, info, base):
+        """
+        True when a base class resolves to an existing file and it (or its bases) defines steps.
+        """
+        base_key = self.resolve_base(info, base)
+        # class_steps is empty for a missing file or a class without steps
+        return base_key is not None and bool(self.class_steps(base_key))
+
+    def file_entries(self, folder, file_name, path):
+        """
+        All steps of a file: its own functions and class methods plus the methods
+        inherited from tal / ProjectComponents / Utility base classes.
+        """
+        info = self.file_info(path)
+        module = os.path.splitext(file_name)[0]
+        results = []
+        for item in info.items:
+            if isinstance(item, StepRecord):
+                results.append(make_entry(module, item, path))
+                continue
+            for method in item.methods:
+                results.append(make_entry(module, method, path))
+            for base in item.bases:
+                base_key = self.resolve_base(info, base)
+                if base_key is None:
+                    continue
+                self._dependents.setdefault(base_key, set()).add((path, item.name))
+                # inherited steps are named after the module of the subclass
+                results.extend(make_entry(module, record, source) for record, source in self.class_steps(base_key))
+        return results
+
+    def class_steps(self, key):
+        """
+        (StepRecord, source path) of a class and all its bases, resolved once and shared by all subclasses.
+        """
+        order = self._class_order.get(key)
+        if order is not None:
+            # a memoized hierarchy is only valid while none of its files changed
+            for path in {k[0] for k in order}:
+                self.file_info(path)
+        steps = self._class_steps.get(key)
+        if steps is None:
+            steps = tuple(
+                (record, file_path)
+                for file_path, class_name in self.class_order(key)
+                for cls in self.file_info(file_path).classes(class_name)
+                for record in cls.methods
+            )
+            self._class_steps[key] = steps
+        return steps
+
+    def class_order(self, key, _active=None):
+        """
+        The class and all its bases, depth first, every class once.
+        """
+        order = self._class_order.get(key)
+        if order is not None:
+            return order
+        file_path, class_name = key
+        if not os.path.isfile(file_path):
+            return ()
+        active = _active if _active is not None else set()
+        active.add(key)
+        info = self.file_info(file_path)
+        order = [key]
+        seen = {key}
+        for cls in info.classes(class_name):
+            for base in cls.bases:
+                base_key = self.resolve_base(info, base)
+                if base_key is None:
+                    continue
+                self._dependents.setdefault(base_key, set()).add(key)
+                if base_key in active:
+                    # inheritance cycle
+                    continue
+                for k in self.class_order(base_key, active):
+                    if k not in seen:
+                        seen.add(k)
+                        order.append(k)
+        active.discard(key)
+        order = tuple(order)
+        self._class_order[key] = order
+        return order
+
+    def resolve_base(self, info, base) -> Optional[Tuple[str, str]]:
+        """
+        Map a base class name used in a file to (file path, class name).
+        """
+        if base in info.tal_imports:
+            return self.tal_class_path(*info.tal_imports[base])
+        if base in info.proj_imports:
+            mod, cls = info.proj_imports[base]
+            if not self.project_root:
+                return None
+            rel = mod[len("ProjectComponents."):].replace(".", os.sep) + ".py"
+            return os.path.join(self.project_root, rel), cls
+        if base in info.util_imports:
+            mod, cls = info.util_imports[base]
+            if not self.workspace_root:
+                return None
+            # Utility.SupportingScripts.ParallelTestSteps.ParallelExecution -> <workspace>/Utility/.../ParallelExecution.py
+            rel = mod.replace(".", os.sep) + ".py"
+            return os.path.join(self.workspace_root, rel), cls
+        if base == "DiagnosisInterface" and self.diag_resolver:
+            # special-case: the implementation is selected in *_devices.cfg (e.g. UdsSymbolic)
+            resolved = self.diag_resolver()
+            if resolved:
+                return self.tal_class_path(*resolved)
+        return None
+
+    def tal_class_path(self, module_name, class_name):
+        if module_name.startswith("tal."):
+            rel = module_name[len("tal."):].replace(".", os.sep) + ".py"
+        elif module_name == "tal":
+            rel = class_name + ".py"
+        else:
+            rel = module_name.replace(".", os.sep) + ".py"
+        return os.path.join(self.lib_root, rel), class_name
+
+
+class CatalogStore:
+    """
+    SQLite table of FileInfos: path, mtime, size, content hash and the json of the FileInfo.
+    Bump FORMAT when the extraction rules change, old caches are then dropped.
+    """
+    FORMAT = 1
+    COMMIT_EVERY = 200
+
+    def __init__(self, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = self._db.execute("SELECT value FROM meta WHERE key='format'").fetchone()
+        if not row or row[0] != str(self.FORMAT):
+            self._db.execute("DROP TABLE IF EXISTS files")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('format', ?)", (str(self.FORMAT),))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files "
+            "(path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, digest TEXT, info TEXT)"
+        )
+        self._db.commit()
+        self._pending = 0
+
+    def load(self, path, stamp):
+        """
+        FileInfo of 'path' if the cached one has the same (mtime, size)
+        """
+        if stamp is None:
+            return None
+        row = self._db.execute("SELECT mtime, size, digest, info FROM files WHERE path=?", (path,)).fetchone()
+        if not row or (row[0], row[1]) != stamp:
+            return None
+        return FileInfo.from_json(path, stamp, row[2], row[3])
+
+    def load_digest(self, path, stamp, digest):
+        """
+        FileInfo of 'path' if only its (mtime, size) changed but not its content
+        """
+        if digest is None:
+            return None
+        row = self._db.execute("SELECT digest, info FROM files WHERE path=?", (path,)).fetchone()
+        if not row or row[0] != digest:
+            return None
+        self._db.execute("UPDATE files SET mtime=?, size=? WHERE path=?", (*stamp, path))
+        self._written()
+        return FileInfo.from_json(path, stamp, digest, row[1])
+
+    def stamps(self):
+        return {path: (mtime, size) for path, mtime, size in self._db.execute("SELECT path, mtime, size FROM files")}
+
+    def save(self, info):
+        if info.stamp is None:
+            self._db.execute("DELETE FROM files WHERE path=?", (info.path,))
+        else:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                (info.path, info.stamp[0], info.stamp[1], info.digest, info.to_json()),
+            )
+        self._written()
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= self.COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        if self._pending:
+            self._db.commit()
+            self._pending = 0
+
+    def close(self):
+        self.commit()
+        self._db.close()
+
+
+def lib_version(lib_root):
+    """
+    Version of the installed distribution that provides the package at lib_root (e.g. 'tal'),
+    looked up in the dist-info folders next to it. None when unknown.
+    """
+    from importlib import metadata
+
+    package = os.path.basename(os.path.normpath(lib_root))
+    try:
+        for dist in metadata.distributions(path=[os.path.dirname(os.path.normpath(lib_root))]):
+            top_level = (dist.read_text("top_level.txt") or "").split()
+            if package in top_level or (dist.metadata["Name"] or "").lower() == package.lower():
+                return dist.version
+    except OSError:
+        pass
+    return None
+
+
+def lib_index_path(cache_dir, lib_root, version):
+    """
+    Where the LibIndex generated for one installed version of a library is kept.
+    """
+    package = os.path.basename(os.path.normpath(lib_root))
+    return os.path.join(cache_dir, f"{package}-{version or 'unknown'}.{LIB_INDEX_NAME}")
+
+
+def open_lib_index(lib_root, cache_dir=None, version=None):
+    """
+    The prebuilt index of a library: the one generated for this installation in cache_dir, else
+    the one shipped in the package (its mtimes are the build machine's, so the files are checked
+    by content hash once and the result is kept in cache_dir). None when there is none yet.
+    """
+    if not os.path.isdir(lib_root):
+        return None
+    version = version or lib_version(lib_root)
+    local = lib_index_path(cache_dir, lib_root, version) if cache_dir else None
+    index = LibIndex.open(local, lib_root, version) if local else None
+    if index is not None:
+        return index
+    index = LibIndex.open(os.path.join(lib_root, LIB_INDEX_NAME), lib_root, version)
+    if index is not None:
+        index.restamp()
+        if local:
+            index.save(local)
+    return index
+
+
+class LibIndex:
+    """
+    Prebuilt parse results of a whole installed library (the tal package, DiagnosisInterface
+    implementations like UdsSymbolic and UdsRaw included): classes, bases, PascalCase methods with
+    their signatures and docstrings, in one JSON file
+
+        {"format", "package", "version", "files": {relative path: [mtime, size, sha1, FileInfo json]}}
+
+    The file is only used for the same distribution version and extraction FORMAT; every file is
+    still checked by (mtime, size), or by content hash when only the mtime differs, so a patched
+    file is parsed again instead of served stale.
+    """
+
+    def __init__(self, lib_root, version=None, files=None):
+        self.lib_root = lib_root
+        self.version = version
+        self._prefix = os.path.join(lib_root, "")
+        self._files = files if files is not None else {}
+
+    @classmethod
+    def open(cls, path, lib_root, version):
+        """
+        The index stored at 'path', None when it is missing, unreadable or for another version.
+        """
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("format") != CatalogStore.FORMAT or data.get("version") != version:
+            return None
+        return cls(lib_root, version, data["files"])
+
+    @classmethod
+    def build(cls, lib_root, version=None, catalog=None, workers=None, ignore=DEFAULT_IGNORE):
+        """
+        Index every step candidate file below lib_root. Parse results the catalog already has are
+        taken over, the other files are parsed in a process pool.
+        """
+        index = cls(lib_root, version)
+        stale = []
+        for entry in scan_python_files(lib_root, ignore=ignore):
+            info = catalog.cached(entry.path, entry_stamp(entry)) if catalog else None
+            if info is not None and info.digest is not None:
+                index.put(info)
+            else:
+                stale.append(entry.path)
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for info in pool.map(parse_worker, stale, chunksize=16):
+                    index.put(info)
+        else:
+            for path in stale:
+                index.put(parse_worker(path))
+        return index
+
+    def save(self, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        data = {
+            "format": CatalogStore.FORMAT,
+            "package": os.path.basename(os.path.normpath(self.lib_root)),
+            "version": self.version,
+            "files": self._files,
+        }
+        # write aside first, a reader must never see half an index
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+
+    def __len__(self):
+        return len(self._files)
+
+    def _key(self, path):
+        if not path.startswith(self._prefix):
+            return None
+        return path[len(self._prefix):].replace(os.sep, "/")
+
+    def put(self, info):
+        key = self._key(info.path)
+        if key is not None and info.stamp is not None:
+            self._files[key] = [info.stamp[0], info.stamp[1], info.digest, info.to_json()]
+
+    def load(self, path, stamp):
+        """
+        FileInfo of 'path' if the indexed one has the same (mtime, size)
+        """
+        row = self._files.get(self._key(path))
+        if stamp is None or not row or (row[0], row[1]) != tuple(stamp):
+            return None
+        return FileInfo.from_json(path, stamp, row[2], row[3])
+
+    def load_digest(self, path, stamp, digest):
+        """
+        FileInfo of 'path' if only its (mtime, size) changed but not its content
+        """
+        row = self._files.get(self._key(path))
+        if digest is None or not row or row[2] != digest:
+            return None
+        row[0], row[1] = stamp
+        return FileInfo.from_json(path, stamp, digest, row[3])
+
+    def stamps(self):
+        return {
+            os.path.join(self.lib_root, *key.split("/")): (row[0], row[1])
+            for key, row in self._files.items()
+        }
+
+    def restamp(self):
+        """
+        Take over the (mtime, size) of the installed files whose content matches the index
+        and drop the entries of files that changed or are gone.
+        """
+        for key, row in list(self._files.items()):
+            path = os.path.join(self.lib_root, *key.split("/"))
+            stamp = file_stamp(path)
+            if stamp is None:
+                del self._files[key]
+            elif (row[0], row[1]) != stamp:
+                if read_source(path)[1] == row[2]:
+                    row[0], row[1] = stamp
+                else:
+                    del self._files[key]
+
+
+def parse_worker(path):
+    """
+    Process pool entry point: parse one file.
+    """
+    return parse_file(path)
+
+
+def scan_folder(folder, ignore=DEFAULT_IGNORE):
+    """
+    (sub folders, step candidate .py files) of one folder as name sorted lists of os.DirEntry.
+    One directory listing, no stat per entry.
+    """
+    folders, files = [], []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                name = entry.name
+                if any(fnmatch.fnmatchcase(name, pattern) for pattern in ignore):
+                    continue
+                if entry.is_dir():
+                    folders.append(entry)
+                elif name.endswith(".py") and not name.startswith("__init__"):
+                    files.append(entry)
+    except OSError:
+        pass
+    folders.sort(key=lambda entry: entry.name)
+    files.sort(key=lambda entry: entry.name)
+    return folders, files
+
+
+def scan_python_files(folder, depth=None, ignore=DEFAULT_IGNORE):
+    """
+    Yield the os.DirEntry of the step candidate .py files below a folder, lazily: files of a folder
+    first, then its sub folders. depth=0 lists the folder only, None has no limit.
+    """
+    folders, files = scan_folder(folder, ignore)
+    yield from files
+    if depth == 0:
+        return
+    for entry in folders:
+        yield from scan_python_files(entry.path, None if depth is None else depth - 1, ignore)
+
+
+def python_files(folder, depth=None, ignore=DEFAULT_IGNORE):
+    """
+    Yield the paths of the step candidate .py files below a folder (see scan_python_files).
+    """
+    for entry in scan_python_files(folder, depth, ignore):
+        yield entry.path
+
+
+class CatalogIndexer:
+    """
+    Parses the files of whole trees in a process pool, away from the GUI thread.
+
+    Files whose (mtime, size) match 'known' (see StepCatalog.known_stamps) are skipped.
+    Folders asked for with request() (e.g. expanded in the GUI) are parsed first; cancel()
+    drops the files of a folder that are not parsed yet (e.g. collapsed again). Results arrive
+    in 'results' (queue.Queue) as
+
+        ("file", FileInfo)          hand it to StepCatalog.put on the owner's thread
+        ("folder", folder)          every file of a requested folder is parsed
+        ("progress", done, total)
+        ("done",)                   the whole sweep is finished
+    """
+
+    def __init__(self, known, workers=None, ignore=DEFAULT_IGNORE):
+        self.results = queue.Queue()
+        self._known = known
+        self._ignore = ignore
+        self._workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self._pending = deque()     # paths waiting for a worker, requested folders first
+        self._queued = set()
+        self._folders = {}          # requested folder -> paths not parsed yet
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._walking = False
+        self._announced = False
+        self._stopped = False
+        self._executor = None
+        self._thread = None
+        self.done = 0
+        self.total = 0
+
+    def start(self, roots):
+        """
+        Start the sweep over the given root folders.
+        """
+        self._walking = True
+        self._executor = ProcessPoolExecutor(max_workers=self._workers)
+        threading.Thread(target=self._walk, args=(list(roots),), name="CatalogIndexerWalk", daemon=True).start()
+        self._thread = threading.Thread(target=self._dispatch, name="CatalogIndexer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._pending.clear()
+            self._cond.notify_all()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def request(self, folder):
+        """
+        Parse the files of one folder (not recursive) before anything else.
+        """
+        stale = [entry.path for entry in scan_python_files(folder, 0, self._ignore) if self._is_stale(entry)]
+        with self._cond:
+            if not stale:
+                self.results.put(("folder", folder))
+                return
+            self._folders[folder] = set(stale)
+            for path in reversed(stale):
+                if path in self._queued:
+                    try:
+                        self._pending.remove(path)
+                    except ValueError:
+                        # already with a worker
+                        continue
+                else:
+                    self._queued.add(path)
+                    self.total += 1
+                self._pending.appendleft(path)
+            self._cond.notify_all()
+
+    def cancel(self, folder):
+        """
+        Drop the files of a folder (and its sub folders) that were not handed to a worker yet.
+        """
+        prefix = os.path.join(folder, "")
+        with self._cond:
+            self._folders.pop(folder, None)
+            keep = deque(path for path in self._pending if not path.startswith(prefix))
+            dropped = len(self._pending) - len(keep)
+            self._queued.difference_update(path for path in self._pending if path.startswith(prefix))
+            self._pending = keep
+            self.total -= dropped
+            self.results.put(("progress", self.done, self.total))
+
+    def _is_stale(self, entry):
+        stamp = entry_stamp(entry)
+        return stamp is not None and self._known.get(entry.path) != stamp
+
+    def _walk(self, roots):
+        for root in roots:
+            if not root or not os.path.isdir(root):
+                continue
+            for entry in scan_python_files(root, ignore=self._ignore):
+                if self._stopped:
+                    return
+                if not self._is_stale(entry):
+                    continue
+                path = entry.path
+                with self._cond:
+                    if path in self._queued:
+                        continue
+                    self._queued.add(path)
+                    self._pending.append(path)
+                    self.total += 1
+                    self._cond.notify_all()
+        with self._cond:
+            self._walking = False
+            self._cond.notify_all()
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._stopped and (not self._pending or self._in_flight >= self._workers * 2):
+                    if not self._pending and not self._walking and not self._in_flight and not self._announced:
+                        self.results.put(("done",))
+                        self._announced = True
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                path = self._pending.popleft()
+                self._in_flight += 1
+                self._announced = False
+            future = self._executor.submit(parse_worker, path)
+            future.add_done_callback(lambda f, p=path: self._finished(p, f))
+
+    def _finished(self, path, future):
+        with self._cond:
+            self._in_flight -= 1
+            self._queued.discard(path)
+            self.done += 1
+            if not future.cancelled() and future.exception() is None:
+                info = future.result()
+                self._known[path] = info.stamp
+                self.results.put(("file", info))
+            for folder, paths in list(self._folders.items()):
+                paths.discard(path)
+                if not paths:
+                    del self._folders[folder]
+                    self.results.put(("folder", folder))
+            self.results.put(("progress", self.done, self.total))
+            self._cond.notify_all()
+
+
+# inotify (Linux), see inotify(7)
+_IN_MODIFY = 0x2
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ISDIR = 0x40000000
+_IN_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF
+_IN_EVENT = struct.Struct("iIII")
+
+
+def _inotify_init():
+    """
+    (libc, inotify fd) or None when inotify is not available (not Linux, no libc).
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    return libc, fd
+
+
+class WorkspaceWatcher:
+    """
+    Reports changes of .py files and folders below some root folders, through inotify on Linux and
+    by polling the (mtime, size) of the files elsewhere (or when inotify is not available, e.g. the
+    watch limit is reached). Changes arrive in 'changes' (queue.Queue) as sets of paths, a burst of
+    changes (an editor saving, a git checkout) is reported once it settled.
+    Hand them to StepCatalog.refresh on the owner's thread.
+    """
+
+    SETTLE = 0.3
+
+    def __init__(self, roots, interval=2.0, ignore=DEFAULT_IGNORE):
+        self.changes = queue.Queue()
+        self.mode = None            # "inotify" or "polling" once started
+        self._roots = [root for root in roots if root and os.path.isdir(root)]
+        self._interval = interval
+        self._ignore = ignore
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="WorkspaceWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        inotify = _inotify_init()
+        if inotify is not None:
+            self.mode = "inotify"
+            if self._watch(*inotify):
+                return
+        self.mode = "polling"
+        self._poll()
+
+    def _snapshot(self):
+        return {
+            entry.path: entry_stamp(entry)
+            for root in self._roots
+            for entry in scan_python_files(root, ignore=self._ignore)
+        }
+
+    def _poll(self):
+        before = self._snapshot()
+        while not self._stop.wait(self._interval):
+            after = self._snapshot()
+            changed = {path for path in before.keys() | after.keys() if before.get(path) != after.get(path)}
+            before = after
+            if changed:
+                self.changes.put(changed)
+
+    def _watch(self, libc, fd):
+        """
+        inotify loop. Returns False when a folder could not be watched, the caller polls instead.
+        """
+        watches = {}  # watch descriptor -> folder
+
+        def add(folder):
+            wd = libc.inotify_add_watch(fd, os.fsencode(folder), _IN_WATCH_MASK)
+            if wd < 0:
+                return False
+            watches[wd] = folder
+            return all(add(entry.path) for entry in scan_folder(folder, self._ignore)[0])
+
+        try:
+            if not all(add(root) for root in self._roots):
+                return False
+            pending = set()
+            deadline = None
+            while not self._stop.is_set():
+                timeout = 0.5 if deadline is None else max(0.0, deadline - time.monotonic())
+                if not select.select([fd], [], [], timeout)[0]:
+                    if pending and time.monotonic() >= deadline:
+                        self.changes.put(pending)
+                        pending = set()
+                        deadline = None
+                    continue
+                try:
+                    data = os.read(fd, 65536)
+                except BlockingIOError:
+                    continue
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, length = _IN_EVENT.unpack_from(data, offset)
+                    name = os.fsdecode(data[offset + _IN_EVENT.size:offset + _IN_EVENT.size + length].rstrip(b"\0"))
+                    offset += _IN_EVENT.size + length
+                    if mask & _IN_Q_OVERFLOW:
+                        # events were lost, let the catalog compare the stamps of everything
+                        pending.update(self._roots)
+                        continue
+                    folder = watches.get(wd)
+                    if folder is None:
+                        continue
+                    if mask & _IN_IGNORED:
+                        del watches[wd]
+                        continue
+                    if not name or any(fnmatch.fnmatchcase(name, pattern) for pattern in self._ignore):
+                        continue
+                    path = os.path.join(folder, name)
+                    if mask & _IN_ISDIR:
+                        if mask & (_IN_CREATE | _IN_MOVED_TO) and not add(path):
+                            return False
+                        pending.add(path)
+                    elif name.endswith(".py"):
+                        pending.add(path)
+                if pending:
+                    deadline = time.monotonic() + self.SETTLE
+            return True
+        finally:
+            os.close(fd)
+
+
+# search -------------------------------------------------------
+_FRAGMENT = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def name_fragments(name):
+    """
+    'BatterySetVoltage' -> ['battery', 'set', 'voltage'], 'ECUReset' -> ['ecu', 'reset']
+    """
+    return [fragment.lower() for fragment in _FRAGMENT.findall(name)]
+
+
+def step_name(entry):
+    """
+    'File0.PowerOn(volt=12.0)' -> 'PowerOn'
+    """
+    return entry["test_step_definition"].split("(", 1)[0].rsplit(".", 1)[-1]
+
+
+class _TrieNode:
+    __slots__ = ("children", "keys")
+
+    def __init__(self):
+        self.children = {}
+        self.keys = []  # every name fragment starting with the prefix of this node
+
+
+class StepSearchIndex:
+    """
+    In-memory search over step entries (see StepCatalog.file_entries):
+
+    - a prefix trie on the PascalCase fragments of the step names, so 'BatVolt' finds 'BatterySetVoltage'
+    - an inverted index on the words of the docstrings
+
+    Every query fragment has to match (name fragment prefix or docstring word). Entries matching
+    all fragments by name rank first, those whose name starts with the query before them, then
+    names with the fragments in query order; ties go to the shorter name.
+
+    Entries added under a key (e.g. their file) can be replaced later with remove(key) + add, so a
+    changed file does not rebuild the whole index.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self._keys = []          # key per entry
+        self._key_ids = {}       # key -> entry ids
+        self._removed = set()    # ids of removed entries, skipped until the next compaction
+        self._fragments = []  # name fragments per entry
+        self._sort_keys = []  # (length, lower case name) per entry
+        self._trie = _TrieNode()
+        self._fragment_ids = {}  # name fragment -> entry ids
+        self._postings = {}      # docstring word -> entry ids
+        self._names = None       # sorted (lower case name, id), for 'name starts with' lookups
+        self._words = None       # sorted docstring words, for prefix lookups
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self.entries) - len(self._removed)
+
+    def add(self, entry, key=None):
+        index = len(self.entries)
+        name = step_name(entry)
+        fragments = name_fragments(name)
+        self.entries.append(entry)
+        self._keys.append(key)
+        if key is not None:
+            self._key_ids.setdefault(key, []).append(index)
+        self._fragments.append(fragments)
+        self._sort_keys.append((len(name), name.lower()))
+        for fragment in fragments:
+            ids = self._fragment_ids.get(fragment)
+            if ids is None:
+                ids = self._fragment_ids[fragment] = set()
+                node = self._trie
+                for char in fragment:
+                    node = node.children.get(char) or node.children.setdefault(char, _TrieNode())
+                    node.keys.append(fragment)
+            ids.add(index)
+        for word in set(_WORD.findall((entry.get("test_step_description") or "").lower())):
+            if len(word) > 1:
+                self._postings.setdefault(word, set()).add(index)
+        self._names = self._words = None
+
+    def remove(self, key):
+        """
+        Drop the entries added under a key.
+        """
+        self._removed.update(self._key_ids.pop(key, ()))
+        if len(self._removed) > len(self.entries) // 2:
+            # mostly dead entries: start over with the live ones
+            live = [(entry, key) for index, (entry, key) in enumerate(zip(self.entries, self._keys))
+                    if index not in self._removed]
+            self.__init__()
+            for entry, key in live:
+                self.add(entry, key)
+
+    def search(self, query, limit=200):
+        """
+        Entries matching a query, best first.
+        """
+        terms = [fragment for word in query.split() for fragment in name_fragments(word)]
+        if not terms:
+            return []
+        starts = self._name_lookup("".join(terms))
+        hits = in_name = None
+        for term in terms:
+            names = self._fragment_lookup(term)
+            if len(terms) == 1:
+                # 'batterys' is no fragment prefix, but still the start of 'BatterySetVoltage'
+                names |= starts
+            matched = names | self._doc_lookup(term)
+            if self._removed:
+                names -= self._removed
+                matched -= self._removed
+            hits = matched if hits is None else hits & matched
+            in_name = names if in_name is None else in_name & names
+            if not hits:
+                return []
+        starts &= in_name
+        tiers = [starts, in_name - starts]
+        if len(terms) > 1:
+            tiers = [part for tier in tiers for part in self._split_in_order(tier, terms)]
+        tiers.append(hits - in_name)
+
+        results = []
+        for tier in tiers:
+            results.extend(heapq.nsmallest(limit - len(results), tier, key=self._sort_keys.__getitem__))
+            if len(results) >= limit:
+                break
+        return [self.entries[index] for index in results]
+
+    def _fragment_lookup(self, term):
+        node = self._trie
+        for char in term:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return set().union(*(self._fragment_ids[key] for key in node.keys))
+
+    def _name_lookup(self, prefix):
+        if self._names is None:
+            self._names = sorted((name, index) for index, (_, name) in enumerate(self._sort_keys)
+                                 if index not in self._removed)
+        start = bisect.bisect_left(self._names, (prefix,))
+        end = bisect.bisect_left(self._names, (prefix + "\uffff",))
+        return {index for _, index in self._names[start:end]}
+
+    def _doc_lookup(self, term):
+        if len(term) < 3:
+            # short prefixes would match half of the docstrings
+            return self._postings.get(term, set())
+        if self._words is None:
+            self._words = sorted(self._postings)
+        ids = set()
+        start = bisect.bisect_left(self._words, term)
+        for word in self._words[start:]:
+            if not word.startswith(term):
+                break
+            ids |= self._postings[word]
+        return ids
+
+    def _split_in_order(self, ids, terms):
+        ordered, other = set(), set()
+        for index in ids:
+            (ordered if self._in_order(self._fragments[index], terms) else other).add(index)
+        return ordered, other
+
+    @staticmethod
+    def _in_order(fragments, terms):
+        position = 0
+        for term in terms:
+            while position < len(fragments) and not fragments[position].startswith(term):
+                position += 1
+            if position == len(fragments):
+                return False
+            position += 1
+        return True
+
+
+# headless export ----------------------------------------------
+def project_files(project_root, include=(), exclude=(), depth=None, ignore=DEFAULT_IGNORE):
+    """
+    (folder, path) of the files the GUI lists below the top level folders of ProjectComponents
+    (sub folders included), filtered with glob patterns on '<folder>/<file>' ('<folder>/<sub>/<file>').
+    """
+    for folder_entry in scan_folder(project_root, ignore)[0]:
+        folder = folder_entry.name
+        for path in python_files(folder_entry.path, depth, ignore):
+            rel = os.path.relpath(path, project_root).replace(os.sep, "/")
+            if include and not any(fnmatch.fnmatch(rel, pattern) for pattern in include):
+                continue
+            if any(fnmatch.fnmatch(rel, pattern) for pattern in exclude):
+                continue
+            yield folder, path
+
+
+def project_file_folder(project_root, path, ignore=DEFAULT_IGNORE):
+    """
+    The top level folder project_files lists a file under, None when it does not list the file.
+    """
+    parts = os.path.relpath(path, project_root).split(os.sep)
+    if len(parts) < 2 or parts[0] == os.pardir:
+        return None
+    if any(fnmatch.fnmatchcase(part, pattern) for part in parts for pattern in ignore):
+        return None
+    name = parts[-1]
+    if not name.endswith(".py") or name.startswith("__init__"):
+        return None
+    return parts[0]
+
+
+def export_catalog(project_root, out, lib_root=DEFAULT_LIB_ROOT, include=(), exclude=(),
+                   workers=None, cache_path=None, station=None, depth=None, ignore=DEFAULT_IGNORE):
+    """
+    Write every step of a ProjectComponents tree to the text stream 'out' as JSON Lines and
+    return (steps, files). Entries are the ones of StepCatalog.file_entries plus their 'folder'.
+    """
+    workspace_root = os.path.dirname(project_root)
+    resolved = resolve_diag_impl(workspace_root, station)
+    diag_impl = resolved[:2] if resolved else None
+    cache_dir = os.path.dirname(os.path.abspath(cache_path)) if cache_path else None
+    version = lib_version(lib_root) if os.path.isdir(lib_root) else None
+    lib_index = open_lib_index(lib_root, cache_dir, version)
+    catalog = StepCatalog(lib_root, project_root, workspace_root, lambda: diag_impl, cache_path, lib_index)
+    try:
+        # parse the workspace up front in worker processes, base classes are then served from memory
+        known = catalog.known_stamps()
+        stale = [
+            entry.path
+            for root in (project_root, os.path.join(workspace_root, "Utility"), lib_root)
+            for entry in scan_python_files(root, ignore=ignore)
+            if entry_stamp(entry) != known.get(entry.path)
+        ]
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for info in pool.map(parse_worker, stale, chunksize=16):
+                    catalog.put(info)
+        else:
+            for path in stale:
+                catalog.put(parse_worker(path))
+        if lib_index is None and cache_dir and os.path.isdir(lib_root):
+            # everything is parsed now, the next runs load the library from the index
+            LibIndex.build(lib_root, version, catalog, ignore=ignore).save(lib_index_path(cache_dir, lib_root, version))
+
+        steps = files = 0
+        for folder, path in project_files(project_root, include, exclude, depth, ignore):
+            for entry in catalog.file_entries(folder, os.path.basename(path), path):
+                entry["folder"] = folder
+                out.write(json.dumps(entry) + "\n")
+                steps += 1
+            files += 1
+        return steps, files
+    finally:
+        catalog.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the MAIA test step catalog as JSON Lines")
+    parser.add_argument("root", nargs="?", help="...\\Workspaces\\<project> or its ProjectComponents folder")
+    parser.add_argument("-o", "--output", help="JSONL file (default: stdout)")
+    parser.add_argument("--lib", default=DEFAULT_LIB_ROOT, help="tal library folder")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB",
+                        help="only files matching '<folder>/<file>' (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="skip files matching '<folder>/<file>' (repeatable)")
+    parser.add_argument("--ignore", action="append", default=[], metavar="GLOB",
+                        help="also skip folders/files with this name, e.g. 'build' or 'Archive*' (repeatable)")
+    parser.add_argument("--depth", type=int, help="sub folder levels below the top level folders (default: all)")
+    parser.add_argument("-j", "--workers", type=int, help="parser processes (default: cpu count)")
+    parser.add_argument("--cache", help="SQLite parse cache, reused by the next run")
+    parser.add_argument("--station", help="host name for <station>_devices.cfg (default: this host)")
+    parser.add_argument("--build-lib-index", action="store_true",
+                        help=f"write the prebuilt index of --lib instead (default output: <lib>/{LIB_INDEX_NAME})")
+    args = parser.parse_args(argv)
+
+    # exported source paths are absolute, like the ones of the workspace
+    args.lib = os.path.abspath(args.lib)
+    if args.build_lib_index:
+        start = time.perf_counter()
+        version = lib_version(args.lib)
+        index = LibIndex.build(args.lib, version, workers=args.workers, ignore=DEFAULT_IGNORE + tuple(args.ignore))
+        index.save(args.output or os.path.join(args.lib, LIB_INDEX_NAME))
+        print(f"{len(index)} files of {args.lib} (version {version or 'unknown'}) indexed "
+              f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        return
+    if not args.root:
+        parser.error("the workspace folder is required")
+
+    project_root = os.path.abspath(args.root)
+    if os.path.isdir(os.path.join(project_root, "ProjectComponents")):
+        project_root = os.path.join(project_root, "ProjectComponents")
+    if not os.path.isdir(project_root):
+        parser.error(f"no such folder: {args.root}")
+
+    start = time.perf_counter()
+    options = dict(lib_root=args.lib, include=args.include, exclude=args.exclude,
+                   workers=args.workers, cache_path=args.cache, station=args.station,
+                   depth=args.depth, ignore=DEFAULT_IGNORE + tuple(args.ignore))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            steps, files = export_catalog(project_root, out, **options)
+    else:
+        steps, files = export_catalog(project_root, sys.stdout, **options)
+    print(f"{steps} steps from {files} files in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,15 @@
 import os
 import sys
 import json
-import ast
+import bisect
+import queue
+import time
 import subprocess
 import importlib
+from collections import deque
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import xml.etree.ElementTree as ET
 from typing import Optional, Tuple
-import platform
 
 # ==========================================================
 # 🔧 Ensure all required packages are installed automatically
@@ -22,6 +23,21 @@ PYTHON_ROOT = os.path.dirname(PYTHON_PATH)
 # Build path to tal inside Lib/site-packages
 EXTRA_LIB_ROOT = os.path.join(PYTHON_ROOT, "Lib", "site-packages", "tal")
 
+# Parse results kept between sessions (only changed files are parsed again on startup)
+CATALOG_CACHE_PATH = os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "MAIA",
+    "step_catalog.sqlite",
+)
+
+# Treeview rows are inserted in slices so expanding a huge node never blocks the GUI
+INSERT_BATCH = 200     # rows per event loop slice
+VIRTUAL_LIMIT = 500    # above this many children only pages near the viewport become rows
+VIRTUAL_PAGE = 200     # rows per page in that mode
+
+# selection changes within this time (ms) are rendered into the preview at once
+PREVIEW_DELAY = 50
+
 
 def ensure_package(pkg_name, import_name=None):
     """Automatically install a pip package if missing."""
@@ -43,8 +59,46 @@ ensure_package("customtkinter")
 # ==========================================================
 import customtkinter as ctk
 
+from StepCatalog import (
+    StepCatalog,
+    CatalogIndexer,
+    LibIndex,
+    StepSearchIndex,
+    WorkspaceWatcher,
+    project_files,
+    project_file_folder,
+    entry_stamp,
+    lib_index_path,
+    lib_version,
+    open_lib_index,
+    python_files,
+    resolve_diag_impl,
+    scan_folder,
+)
+
 # tal root stays the same
 
+class TreeNode:
+    """
+    Python side state of one Treeview item, the Treeview only renders it.
+    kind: 'root', 'folder', 'file', 'method', 'dummy', 'info' or 'more' (rows not materialized yet)
+    """
+    __slots__ = ("kind", "label", "name", "path", "entry", "tag", "checked")
+
+    def __init__(self, kind, label, name="", path="", entry=None, tag=""):
+        self.kind = kind
+        self.label = label    # displayed text without the checkbox
+        self.name = name      # folder / file name
+        self.path = path
+        self.entry = entry    # step entry of a method
+        self.tag = tag
+        self.checked = False
+
+    @property
+    def payload(self):
+        return self.entry if self.kind == "method" else self.path
+
+
 class TestStepTreeApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -70,6 +124,25 @@ class TestStepTreeApp(ctk.CTk):
         self.grid_columnconfigure(1, weight=5)
         self._diag_impl_cache = None  # (module_name, class_name) cache
         self._diag_type_raw = None    # e.g. "uds.symbolic"
+        # parsed files, shared by every tree operation
+        self.catalog = StepCatalog(
+            EXTRA_LIB_ROOT,
+            diag_resolver=self._resolve_diag_impl_from_cfg,
+            cache_path=CATALOG_CACHE_PATH,
+            # tal only changes with an upgrade, its prebuilt index replaces parsing it
+            lib_index=open_lib_index(EXTRA_LIB_ROOT, os.path.dirname(CATALOG_CACHE_PATH)),
+        )
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        # background parsing of the whole workspace
+        self.indexer = None
+        self._indexing_folders = {}   # expanded folder path -> tree item, parsed first by the indexer
+        self._indexing_status = ""
+        # live updates of the tree when step modules are edited
+        self.watcher = None
+        self._file_steps = {}         # file path -> step definitions last listed for it
+        # search over all steps of the workspace, built once the indexer is done
+        self.search_index = None
+        self._search_hits = []
 
         # ===== header =====
         header = ctk.CTkFrame(self, corner_radius=0, height=48, fg_color="#131722")
@@ -107,16 +180,39 @@ class TestStepTreeApp(ctk.CTk):
         # ===== left (tree) =====
         left_frame = ctk.CTkFrame(self, fg_color="#181c27")
         left_frame.grid(row=1, column=0, sticky="nsew", padx=(8, 4), pady=(6, 8))
-        left_frame.grid_rowconfigure(0, weight=1)
+        left_frame.grid_rowconfigure(2, weight=1)
         left_frame.grid_columnconfigure(0, weight=1)
 
+        self.search_entry = ctk.CTkEntry(
+            left_frame,
+            placeholder_text="🔎 Search steps (e.g. BatVolt, voltage)",
+            font=("Segoe UI", 12),
+        )
+        self.search_entry.grid(row=0, column=0, columnspan=2, sticky="ew", padx=4, pady=(4, 4))
+        # shown below the search field while there is a query
+        self.search_results = tk.Listbox(
+            left_frame,
+            height=12,
+            bg="#0f1117",
+            fg="white",
+            selectbackground="#2c5f5a",
+            font=("Consolas", 11),
+            activestyle="none",
+            borderwidth=0,
+            highlightthickness=0,
+        )
+
         self.tree = ttk.Treeview(left_frame, show="tree")
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        yscroll = ttk.Scrollbar(left_frame, orient="vertical", command=self.tree.yview)
-        yscroll.grid(row=0, column=1, sticky="ns")
-        self.tree.configure(yscrollcommand=yscroll.set)
+        self.tree.grid(row=2, column=0, sticky="nsew")
+        self.yscroll = ttk.Scrollbar(left_frame, orient="vertical", command=self.tree.yview)
+        self.yscroll.grid(row=2, column=1, sticky="ns")
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
 
         self.checked_steps = {}
+        self.nodes = {}              # tree item id -> TreeNode
+        self._pending_rows = {}      # tree item id -> deque of child TreeNodes not inserted yet
+        self._more_rows = {}         # tree item id -> its '⋯ more' row (virtual mode)
+        self._scroll_check = None
         self.workspace_root = None   # <— already there
         self.step_sources = {}       # <— ADD THIS
 
@@ -159,6 +255,14 @@ class TestStepTreeApp(ctk.CTk):
             right_frame, wrap="none", font=("Consolas", 12), fg_color="#0f1117"
         )
         self.preview.grid(row=1, column=0, sticky="nsew", padx=10, pady=(0, 8))
+        # the preview holds one block per selected step, in step order, each starting at a text mark
+        self._preview_steps = []     # steps shown, sorted
+        self._preview_marks = {}     # step -> mark at the start of its block
+        self._preview_header = ""
+        self._preview_job = None
+        self._block_cache = {}       # step -> (description, rendered block)
+        self._preview_dirty = set()  # shown steps whose description changed on disk
+        self._mark_seq = 0
 
         bottom = ctk.CTkFrame(right_frame, fg_color="transparent")
         bottom.grid(row=2, column=0, sticky="ew", padx=10, pady=(0, 6))
@@ -183,7 +287,15 @@ class TestStepTreeApp(ctk.CTk):
 
         # events
         self.tree.bind("<<TreeviewOpen>>", self.on_tree_open)
+        self.tree.bind("<<TreeviewClose>>", self.on_tree_close)
         self.tree.bind("<Button-1>", self.on_tree_click)
+        self.search_entry.bind("<KeyRelease>", self.on_search)
+        self.search_entry.bind("<Escape>", self.clear_search)
+        self.search_entry.bind("<Down>", lambda e: self._focus_search_results())
+        self.search_entry.bind("<Return>", lambda e: self._focus_search_results())
+        self.search_results.bind("<ButtonRelease-1>", self.on_search_pick)
+        self.search_results.bind("<Return>", self.on_search_pick)
+        self.search_results.bind("<Escape>", self.clear_search)
 
         # right-click menu
         self.context_menu = tk.Menu(self, tearoff=0)
@@ -193,24 +305,6 @@ class TestStepTreeApp(ctk.CTk):
         # 🔎 auto-detect ...\Workspaces\<project>\ProjectComponents
         self._autodetect_project_root()
 
-    # === PATCH: add to class TestStepTreeApp ===
-    def _diagnosis_type_to_class(self, diag_type: str) -> Optional[str]:
-        """
-        Map 'uds.symbolic' -> 'UdsSymbolic', etc.
-        Extend this mapping as needed.
-        """
-        if not diag_type:
-            return None
-        diag_type = diag_type.strip().lower()
-        mapping = {
-            "uds.symbolic": "UdsSymbolic",
-            "uds.raw": "UdsRaw",
-            "uds.obd": "UdsObd",
-            "uds.odis": "UdsOdis",
-            "uds.odibas": "UdsOdibas",
-        }
-        return mapping.get(diag_type)
-
     def _update_header_project_name(self):
         """
         Update the 'Project – Test Steps' label with the actual project name
@@ -228,103 +322,23 @@ class TestStepTreeApp(ctk.CTk):
         self.title_label.configure(text=f"{project_name} – Test Steps")
 
 
-    def _find_devices_cfgs(self) -> list[str]:
-        """
-        Return the best matching *_devices.cfg under <workspace_root>\Config\Devices.
-
-        Preference order:
-        1. <station>_devices.cfg   (where <station> is the platform/host name)
-        2. devices.cfg / device.cfg
-        3. (optional) nothing -> caller will treat as not resolved
-        """
-        if not self.workspace_root:
-            return []
-
-        devices_dir = os.path.join(self.workspace_root, "Config", "Devices")
-        if not os.path.isdir(devices_dir):
-            return []
-
-        # All .cfg files in Devices folder
-        all_cfgs = [f for f in os.listdir(devices_dir) if f.lower().endswith(".cfg")]
-        if not all_cfgs:
-            print(f"[DiagResolution] No .cfg files found in {devices_dir}")
-            return []
-
-        # 1) Try station-specific: <station>_devices.cfg
-        station = platform.node().lower()  # e.g. 'iads197n'
-        selected: list[str] = []
-
-        if station:
-            wanted = f"{station}_devices.cfg"
-            for name in all_cfgs:
-                if name.lower() == wanted:
-                    selected.append(os.path.join(devices_dir, name))
-                    break  # exact match, we’re done
-
-        # 2) Fallback to generic devices.cfg / device.cfg
-        if not selected:
-            for generic in ("devices.cfg", "device.cfg"):
-                for name in all_cfgs:
-                    if name.lower() == generic:
-                        selected.append(os.path.join(devices_dir, name))
-                        break
-                if selected:
-                    break
-
-        # 3) If still nothing → report and let caller treat as "not resolved"
-        if not selected:
-            print(
-                f"[DiagResolution] No matching devices cfg found for station "
-                f"'{station}' in {devices_dir}. "
-                "Expected '<station>_devices.cfg' or 'devices.cfg'/'device.cfg'."
-            )
-            return []
-
-        return selected
-
     def _resolve_diag_impl_from_cfg(self) -> Optional[Tuple[str, str]]:
         """
-        Inspect *_devices.cfg and return ('ProjectComponents.Diagnosis', '<ClassName>')
-        for the TAL-DEVICE named 'DiagnosisInterface'.
+        ('tal.FunctionalComponents.Diagnosis.DiagnosisInterface', '<ClassName>') for the
+        TAL-DEVICE named 'DiagnosisInterface' in *_devices.cfg.
         Cached after first success.
         """
         if self._diag_impl_cache:
             return self._diag_impl_cache
 
-        for cfg in self._find_devices_cfgs():
-            try:
-                tree = ET.parse(cfg)
-                root = tree.getroot()
-            except Exception:
-                continue
-
-            # Find TAL-DEVICE with name='DiagnosisInterface'
-            for dev in root.findall(".//TAL-DEVICE"):
-                name = dev.get("name") or dev.get("NAME") or ""
-                if name.strip().lower() != "diagnosisinterface":
-                    continue
-
-                diag_type = dev.get("type") or dev.get("TYPE") or ""
-                cls = self._diagnosis_type_to_class(diag_type)
-                if not cls:
-                    # Try looking for a PARM like <PARM name="type" value="uds.symbolic"/>
-                    for p in dev.findall(".//PARM"):
-                        if (p.get("name") or "").strip().lower() == "type":
-                            cls = self._diagnosis_type_to_class(p.get("value") or "")
-                            if cls:
-                                break
-                if cls:
-                    # Remember raw type (e.g. "uds.symbolic") for display
-                    self._diag_type_raw = diag_type.strip() or None
-                    # UDS classes are in tal.FunctionalComponents.Diagnosis.DiagnosisInterface
-                    self._diag_impl_cache = (
-                        "tal.FunctionalComponents.Diagnosis.DiagnosisInterface",
-                        cls,
-                    )
-                    return self._diag_impl_cache
-
-        # nothing found
-        return None
+        resolved = resolve_diag_impl(self.workspace_root)
+        if not resolved:
+            return None
+        module, cls, diag_type = resolved
+        # Remember raw type (e.g. "uds.symbolic") for display
+        self._diag_type_raw = diag_type or None
+        self._diag_impl_cache = (module, cls)
+        return self._diag_impl_cache
 
     def _get_diag_description(self) -> str:
         """
@@ -341,23 +355,6 @@ class TestStepTreeApp(ctk.CTk):
         else:
             return f"Diagnosis: {cls} ({mod})"
 
-    # -----------------------------------------------------------
-    # helper to keep only PascalCase-like names
-    # -----------------------------------------------------------
-    def _is_camel_step(self, name: str) -> bool:
-        """
-        Keep only names like 'BatterySetVoltage':
-        - start with uppercase
-        - no underscores
-        """
-        if not name:
-            return False
-        if not name[0].isupper():
-            return False
-        if "_" in name:
-            return False
-        return True
-
     # -----------------------------------------------------------
     # auto detect
     # -----------------------------------------------------------
@@ -371,21 +368,15 @@ class TestStepTreeApp(ctk.CTk):
                 project_dir = os.sep.join(parts[: idx + 2])
                 pc_dir = os.path.join(project_dir, "ProjectComponents")
                 if os.path.isdir(pc_dir):
-                    self.project_root = pc_dir
-                    self.workspace_root = os.path.dirname(self.project_root)
+                    self._set_project_root(pc_dir)
                     self.root_label.configure(text=f"Root: {self.project_root}")
                     self._update_header_project_name()
                     self.populate_root()
+                    self._start_indexer()
                     return
 
 
-        self.tree.insert(
-            "",
-            "end",
-            text="☐ ❗ Please select your ProjectComponents root (Browse…)",
-            values=("info", ""),
-            tags=("info_tag",),
-        )
+        self._insert_node("", TreeNode("info", "❗ Please select your ProjectComponents root (Browse…)", tag="info_tag"))
 
     # ==================================================================
     # BROWSE / TREE / PARSE / EXPORT
@@ -395,37 +386,40 @@ class TestStepTreeApp(ctk.CTk):
         if not new_root:
             return
 
-        self.project_root = new_root
-        # keep workspace_root in sync for Devices cfg detection
-        self.workspace_root = os.path.dirname(self.project_root)
+        self._set_project_root(new_root)
 
         self.root_label.configure(text=f"Root: {self.project_root}")
         self._update_header_project_name()
+        self._start_indexer()
+
+    def _set_project_root(self, project_root):
+        self.project_root = project_root
+        # keep workspace_root in sync for Devices cfg detection
+        self.workspace_root = os.path.dirname(self.project_root)
+        self.catalog.project_root = self.project_root
+        self.catalog.workspace_root = self.workspace_root
+        self.catalog.reset_classes()
+        self._diag_impl_cache = None
+        self.search_index = None
 
     def populate_root(self):
         if not self.project_root or not os.path.isdir(self.project_root):
             return
 
-        root_id = self.tree.insert(
+        name = os.path.basename(self.project_root) or self.project_root
+        root_id = self._insert_node(
             "",
-            "end",
-            text=self._unchecked("🧱 " + (os.path.basename(self.project_root) or self.project_root)),
+            TreeNode("root", "🧱 " + name, name, self.project_root, tag="folder_tag"),
             open=True,
-            values=("root", self.project_root),
-            tags=("folder_tag",),
         )
 
-        for name in sorted(os.listdir(self.project_root)):
-            full = os.path.join(self.project_root, name)
-            if os.path.isdir(full) and name != "__pycache__":
-                folder_id = self.tree.insert(
-                    root_id,
-                    "end",
-                    text=self._unchecked("📁 " + name),
-                    values=("folder", full),
-                    tags=("folder_tag",),
-                )
-                self.tree.insert(folder_id, "end", text="...", values=("dummy", ""))
+        self._insert_nodes(
+            root_id,
+            [
+                TreeNode("folder", "📁 " + entry.name, entry.name, entry.path, tag="folder_tag")
+                for entry in scan_folder(self.project_root)[0]
+            ],
+        )
 
     def on_tree_open(self, event):
         item_id = self.tree.focus()
@@ -433,63 +427,358 @@ class TestStepTreeApp(ctk.CTk):
         if node_type == "folder":
             self._clear_dummy(item_id)
             self.populate_folder(item_id, payload)
+            if self.indexer and payload not in self._indexing_folders:
+                # the rows come from the pre-scan, they are corrected once the folder is parsed
+                self._indexing_folders[payload] = item_id
+                self.indexer.request(payload)
         elif node_type == "file":
             self._clear_dummy(item_id)
             self.populate_file_methods(item_id, payload)
+        self.catalog.flush()
+
+    def on_tree_close(self, event):
+        item_id = self.tree.focus()
+        node_type, payload = self.get_node_info(item_id)
+        if node_type == "folder" and payload in self._indexing_folders:
+            # the user is not waiting for this folder anymore
+            self.indexer.cancel(payload)
+            self._indexing_folders.pop(payload, None)
+
+    def on_close(self):
+        if self.indexer:
+            self.indexer.stop()
+        if self.watcher:
+            self.watcher.stop()
+        self.catalog.close()
+        self.destroy()
+
+    # background indexing ---------------------------------------
+    def _start_indexer(self):
+        """
+        Parse project_root, the Utility tree and the tal library in worker processes.
+        """
+        if self.indexer:
+            self.indexer.stop()
+        if self.watcher:
+            self.watcher.stop()
+        self._indexing_folders.clear()
+        roots = [self.project_root, os.path.join(self.workspace_root, "Utility"), EXTRA_LIB_ROOT]
+        self.indexer = CatalogIndexer(self.catalog.known_stamps())
+        self.indexer.start(roots)
+        self.after(100, self._poll_indexer, self.indexer)
+        self.watcher = WorkspaceWatcher(roots)
+        self.watcher.start()
+        self.after(500, self._poll_watcher, self.watcher)
+
+    def _poll_indexer(self, indexer):
+        if indexer is not self.indexer:
+            return
+        progress = None
+        # keep the GUI responsive: handle what arrived within a short time slice
+        deadline = time.perf_counter() + 0.03
+        while time.perf_counter() < deadline:
+            try:
+                msg = indexer.results.get_nowait()
+            except queue.Empty:
+                break
+            if msg[0] == "file":
+                self.catalog.put(msg[1])
+            elif msg[0] == "folder":
+                self._folder_indexed(msg[1])
+            elif msg[0] == "progress":
+                progress = msg[1:]
+            elif msg[0] == "done":
+                progress = None
+                self._indexing_status = ""
+                self.catalog.flush()
+                self._save_lib_index()
+                self._build_search_index()
+        if progress and progress[0] < progress[1]:
+            self._indexing_status = f"⏳ Indexing {progress[0]}/{progress[1]} files…"
+        elif progress:
+            self._indexing_status = ""
+        self._update_status()
+        self.after(100, self._poll_indexer, indexer)
+
+    def _save_lib_index(self):
+        """
+        Keep the parse results of tal for the next sessions, once per installed tal version.
+        """
+        if self.catalog.lib_index is not None or not os.path.isdir(EXTRA_LIB_ROOT):
+            return
+        version = lib_version(EXTRA_LIB_ROOT)
+        # the indexer parsed every file by now, nothing is parsed again here
+        index = LibIndex.build(EXTRA_LIB_ROOT, version, self.catalog)
+        try:
+            index.save(lib_index_path(os.path.dirname(CATALOG_CACHE_PATH), EXTRA_LIB_ROOT, version))
+        except OSError as e:
+            print(f"[LibIndex] could not save the tal index: {e}")
+            return
+        self.catalog.lib_index = index
+
+    # live updates ----------------------------------------------
+    def _poll_watcher(self, watcher):
+        if watcher is not self.watcher:
+            return
+        paths = set()
+        while True:
+            try:
+                paths.update(watcher.changes.get_nowait())
+            except queue.Empty:
+                break
+        if paths:
+            self._files_changed(paths)
+            self.catalog.flush()
+        self.after(500, self._poll_watcher, watcher)
+
+    def _files_changed(self, paths):
+        """
+        Patch the tree and the selection after files changed on disk. Only the changed files (and
+        the files inheriting from their classes) are parsed again; method rows of loaded files are
+        rebuilt, file rows are added/removed in loaded folders, check states are kept.
+        """
+        prefix = os.path.join(self.project_root, "")
+        affected = sorted(path for path in self.catalog.refresh(paths) if path.startswith(prefix))
+        items = {}
+        for item_id, node in self.nodes.items():
+            if node.kind in ("root", "folder", "file"):
+                items.setdefault(node.path, []).append(item_id)
+
+        # new and deleted files/folders change the rows of the folders above them
+        folders = set()
+        for path in set(paths).union(affected):
+            while path.startswith(prefix):
+                path = os.path.dirname(path)
+                folders.add(path)
+
+        selection_changed = False
+        for path in affected:
+            old_steps = self._file_steps.pop(path, ())
+            if os.path.isfile(path):
+                entries = self.parse_python_file(os.path.basename(os.path.dirname(path)), os.path.basename(path), path)
+            else:
+                entries = []
+            new_steps = {e["test_step_definition"]: e for e in entries}
+
+            # steps that vanished leave the selection, the kept ones take over the new docstring
+            for step in old_steps:
+                if step not in new_steps and step in self.checked_steps:
+                    self.checked_steps.pop(step)
+                    self.step_sources.pop(step, None)
+                    selection_changed = True
+            for step, e in new_steps.items():
+                if step in self.checked_steps:
+                    before = self.checked_steps[step]["Description"]
+                    self._add_entry(e)
+                    if self.checked_steps[step]["Description"] != before:
+                        self._preview_dirty.add(step)
+                        selection_changed = True
+
+            for item_id in items.get(path, ()):
+                if self.tree.exists(item_id) and self._is_loaded(item_id):
+                    self.populate_file_methods(item_id, path, entries)
+            if self.search_index is not None:
+                self._update_search_index(path, entries)
+
+        for folder in folders:
+            for item_id in items.get(folder, ()):
+                if self.tree.exists(item_id):
+                    self._sync_folder(item_id)
+
+        if selection_changed:
+            self.refresh_preview()
+        if self.search_index is not None and affected and self.search_entry.get().strip():
+            self.on_search()
+
+    def _is_loaded(self, item_id):
+        """
+        True when the children of a folder/file row are in the tree (or on their way).
+        """
+        if item_id in self._pending_rows:
+            return True
+        return not any(self.nodes[child].kind == "dummy" for child in self.tree.get_children(item_id))
+
+    def _sync_folder(self, item_id):
+        """
+        Bring the rows of a loaded folder in line with the disk: rows of deleted folders and of files
+        without steps are removed, new ones are inserted at their sorted position.
+        """
+        if item_id in self._pending_rows or not self._is_loaded(item_id):
+            return
+        node = self.nodes[item_id]
+        wanted = self._folder_nodes(node.path, with_files=node.kind != "root")
+        wanted_paths = {child.path for child in wanted}
+        current = {}
+        for child in self.tree.get_children(item_id):
+            child_node = self.nodes[child]
+            if child_node.kind not in ("folder", "file"):
+                continue
+            if child_node.path in wanted_paths:
+                current[child_node.path] = child
+            else:
+                self._delete_item(child)
+        for index, child_node in enumerate(wanted):
+            if child_node.path not in current:
+                self._insert_row(item_id, child_node, index)
+
+    def _folder_indexed(self, folder_path):
+        item_id = self._indexing_folders.pop(folder_path, None)
+        if item_id and self.tree.exists(item_id):
+            # parse results instead of pre-scan hints (e.g. a file that only looked like steps)
+            self._sync_folder(item_id)
+
+    # search ----------------------------------------------------
+    def _build_search_index(self):
+        """
+        Index every step of the workspace (all files are parsed by now).
+        """
+        index = StepSearchIndex()
+        for folder, path in project_files(self.project_root):
+            for entry in self.parse_python_file(folder, os.path.basename(path), path):
+                entry["folder"] = folder
+                index.add(entry, key=path)
+        self.search_index = index
+        if self.search_entry.get().strip():
+            self.on_search()
+
+    def _update_search_index(self, path, entries):
+        """
+        Replace the steps of one changed file in the search index.
+        """
+        self.search_index.remove(path)
+        folder = project_file_folder(self.project_root, path)
+        if folder is None:
+            return
+        for entry in entries:
+            entry = dict(entry, folder=folder)
+            self.search_index.add(entry, key=path)
+
+    def on_search(self, event=None):
+        if event is not None and event.keysym in ("Down", "Return", "Escape"):
+            return
+        query = self.search_entry.get().strip()
+        if not query:
+            self.search_results.grid_remove()
+            return
+        self.search_results.grid(row=1, column=0, columnspan=2, sticky="ew", padx=4, pady=(0, 4))
+        self.search_results.delete(0, "end")
+        if self.search_index is None:
+            self._search_hits = []
+            self.search_results.insert("end", "⏳ indexing…")
+            return
+        self._search_hits = self.search_index.search(query)
+        for entry in self._search_hits:
+            self.search_results.insert("end", self._search_line(entry))
+        if not self._search_hits:
+            self.search_results.insert("end", "no matching steps")
+
+    def _search_line(self, entry):
+        step = entry["test_step_definition"]
+        text = f"{step}   [{entry.get('folder', '')}]" if entry.get("folder") else step
+        return self._checked(text) if step in self.checked_steps else self._unchecked(text)
+
+    def _focus_search_results(self):
+        if self._search_hits:
+            self.search_results.focus_set()
+            self.search_results.selection_clear(0, "end")
+            self.search_results.selection_set(0)
+            self.search_results.activate(0)
+
+    def clear_search(self, event=None):
+        self.search_entry.delete(0, "end")
+        self.search_results.grid_remove()
+        self.tree.focus_set()
+
+    def on_search_pick(self, event=None):
+        """
+        Check the selected result, the tree is only updated where the step is already shown.
+        """
+        selection = self.search_results.curselection()
+        if not selection or selection[0] >= len(self._search_hits):
+            return
+        index = selection[0]
+        entry = self._search_hits[index]
+        self._add_entry(entry)
+        self._mark_loaded_step(entry["test_step_definition"])
+        self.search_results.delete(index)
+        self.search_results.insert(index, self._search_line(entry))
+        self.search_results.selection_set(index)
+        self.refresh_preview()
+
+    def _mark_loaded_step(self, step):
+        for item_id, node in self.nodes.items():
+            if node.kind == "method" and not node.checked and node.entry["test_step_definition"] == step:
+                self._set_checked(item_id, True)
+
+    def _update_status(self):
+        text = f"{len(self.checked_steps)} steps selected"
+        if self._indexing_status:
+            text += f"   {self._indexing_status}"
+        self.status_label.configure(text=text)
 
     def _clear_dummy(self, item_id):
         for child in self.tree.get_children(item_id):
-            vals = self.tree.item(child, "values")
-            if vals and vals[0] == "dummy":
-                self.tree.delete(child)
+            if self.nodes[child].kind == "dummy":
+                self._delete_item(child)
 
-    def populate_folder(self, folder_item_id, folder_path):
+    def populate_folder(self, folder_item_id, folder_path, entries_by_file=None):
+        """
+        Add the sub folders and the files with steps of a folder.
+        'entries_by_file' ({file path: entries}) saves parsing files the caller already parsed.
+        """
         children = self.tree.get_children(folder_item_id)
-        has_real = any(self.tree.item(c, "values")[0] != "dummy" for c in children)
+        has_real = any(self.nodes[c].kind != "dummy" for c in children)
         if has_real:
             return
 
-        for fname in sorted(os.listdir(folder_path)):
-            if not fname.endswith(".py") or fname.startswith("__init__"):
-                continue
+        self._insert_nodes(folder_item_id, self._folder_nodes(folder_path, entries_by_file))
 
-            fpath = os.path.join(folder_path, fname)
+    def _folder_nodes(self, folder_path, entries_by_file=None, with_files=True):
+        """
+        Rows of a folder: its sub folders, then its files with steps. Without 'entries_by_file'
+        the files are not parsed, a lexical pre-scan decides which ones have steps; the full
+        extraction follows when a file is expanded or checked.
+        """
+        folders, files = scan_folder(folder_path)
+        nodes = [TreeNode("folder", "📁 " + entry.name, entry.name, entry.path, tag="folder_tag") for entry in folders]
+        if not with_files:
+            return nodes
+
+        for entry in files:
+            fname, fpath = entry.name, entry.path
 
-            # 🔍 Parse to see if it contains any valid test steps
-            entries = self.parse_python_file(os.path.basename(folder_path), fname, fpath)
-            if not entries:
+            # 🔍 Does it contain any valid test steps?
+            if entries_by_file is not None and fpath in entries_by_file:
+                has_steps = bool(entries_by_file[fpath])
+            else:
+                has_steps = self.catalog.may_have_steps(fpath, entry_stamp(entry))
+            if not has_steps:
                 # ⚠️ Skip this file because it has no methods to show
                 continue
 
             # ✅ Only display files that contain at least one method
-            file_id = self.tree.insert(
-                folder_item_id,
-                "end",
-                text=self._unchecked("📄 " + fname),
-                values=("file", fpath),
-                tags=("file_tag",),
-            )
-            self.tree.insert(file_id, "end", text="...", values=("dummy", ""))
+            nodes.append(TreeNode("file", "📄 " + fname, fname, fpath, tag="file_tag"))
+        return nodes
 
 
-    def populate_file_methods(self, file_item_id, file_path):
+    def populate_file_methods(self, file_item_id, file_path, entries=None):
         for child in self.tree.get_children(file_item_id):
-            self.tree.delete(child)
-
-        folder_item_id = self.tree.parent(file_item_id)
-        folder_name = self._strip_all(self.tree.item(folder_item_id, "text"))
-        file_name = self._strip_all(self.tree.item(file_item_id, "text"))
-
-        entries = self.parse_python_file(folder_name, file_name, file_path)
-        for e in entries:
-            method_name = e["test_step_definition"].split(".")[-1]
-            self.tree.insert(
-                file_item_id,
-                "end",
-                text=self._unchecked("🛠️" + method_name),
-                values=("method", json.dumps(e)),
-                tags=("method_tag",),
-            )
+            self._delete_item(child)
+
+        if entries is None:
+            folder_name = self.nodes[self.tree.parent(file_item_id)].name
+            entries = self.parse_python_file(folder_name, self.nodes[file_item_id].name, file_path)
+        if not entries:
+            # listed by the lexical pre-scan, but nothing survived the full extraction
+            self._insert_node(file_item_id, TreeNode("info", "(no test steps)", tag="info_tag"))
+            return
+        self._insert_nodes(
+            file_item_id,
+            [
+                TreeNode("method", "🛠️" + e["test_step_definition"].split(".")[-1], entry=e, tag="method_tag")
+                for e in entries
+            ],
+        )
 
     # clicks ----------------------------------------------------
     def on_tree_click(self, event):
@@ -507,31 +796,22 @@ class TestStepTreeApp(ctk.CTk):
         if not item_id:
             return
 
-        text = self.tree.item(item_id, "text")
-        node_type, payload = self.get_node_info(item_id)
-        if node_type == "info":
+        node = self.nodes.get(item_id)
+        if node is not None and node.kind == "more":
+            self._materialize_page(node.path)
+            return "break"
+        if node is None or node.kind in ("info", "dummy"):
             return
 
-        is_checked = text.startswith("☑")
-
-        if is_checked:
-            clean = self._strip_checkbox(text)
-            self.tree.item(item_id, text=self._unchecked(clean))
-            tags = list(self.tree.item(item_id, "tags"))
-            if "checked_tag" in tags:
-                tags.remove("checked_tag")
-            self.tree.item(item_id, tags=tuple(tags))
-            self.uncheck_node(item_id, node_type, payload)
+        if node.checked:
+            self._set_checked(item_id, False)
+            self.uncheck_node(item_id, node.kind, node.payload)
         else:
-            clean = self._strip_checkbox(text)
-            self.tree.item(item_id, text=self._checked(clean))
-            tags = list(self.tree.item(item_id, "tags"))
-            if "checked_tag" not in tags:
-                tags.append("checked_tag")
-            self.tree.item(item_id, tags=tuple(tags))
-            self.check_node(item_id, node_type, payload)
+            self._set_checked(item_id, True)
+            self.check_node(item_id, node.kind, node.payload)
 
         self.refresh_preview()
+        self.catalog.flush()
         return "break"
 
     # right-click -----------------------------------------------
@@ -564,8 +844,7 @@ class TestStepTreeApp(ctk.CTk):
             file_path = payload
 
         elif node_type == "method":
-            entry = json.loads(payload)
-            src = entry.get("source_path")
+            src = payload.get("source_path")
             if src:
                 file_path = src
             else:
@@ -596,124 +875,75 @@ class TestStepTreeApp(ctk.CTk):
     # check / uncheck -------------------------------------------
     def check_node(self, item_id, node_type, payload):
         if node_type == "method":
-            entry = json.loads(payload)
-            self._add_entry(entry)
+            self._add_entry(payload)
         elif node_type == "file":
-            folder_item_id = self.tree.parent(item_id)
-            folder_name = self._strip_all(self.tree.item(folder_item_id, "text"))
-            file_name = self._strip_all(self.tree.item(item_id, "text"))
-            entries = self.parse_python_file(folder_name, file_name, payload)
+            folder_name = self.nodes[self.tree.parent(item_id)].name
+            entries = self.parse_python_file(folder_name, self.nodes[item_id].name, payload)
             for e in entries:
                 self._add_entry(e)
             for child in self.tree.get_children(item_id):
-                txt = self.tree.item(child, "text")
-                if txt.startswith("☐"):
-                    clean = self._strip_checkbox(txt)
-                    tags = list(self.tree.item(child, "tags"))
-                    if "checked_tag" not in tags:
-                        tags.append("checked_tag")
-                    self.tree.item(child, text=self._checked(clean), tags=tuple(tags))
+                if self.nodes[child].kind == "method":
+                    self._set_checked(child, True)
         elif node_type == "folder":
-            folder_name = self._strip_all(self.tree.item(item_id, "text"))
-            folder_path = payload
-
-            entries = self.collect_folder_entries(folder_name, folder_path)
-            for e in entries:
-                self._add_entry(e)
-
-            def mark_children(parent_id):
-                for child in self.tree.get_children(parent_id):
-                    text = self.tree.item(child, "text")
-                    node_type, payload = self.get_node_info(child)
-
-                    if text.startswith("☐"):
-                        clean = self._strip_checkbox(text)
-                        tags = list(self.tree.item(child, "tags"))
-                        if "checked_tag" not in tags:
-                            tags.append("checked_tag")
-                        self.tree.item(child, text=self._checked(clean), tags=tuple(tags))
-
-                    if node_type == "file":
-                        self._clear_dummy(child)
-                        self.populate_file_methods(child, payload)
-                        mark_children(child)
-                    elif node_type == "folder":
-                        self._clear_dummy(child)
-                        self.populate_folder(child, payload)
-                        mark_children(child)
-
-            mark_children(item_id)
+            self._toggle_folder(item_id, True)
 
     def uncheck_node(self, item_id, node_type, payload):
         if node_type == "method":
-            entry = json.loads(payload)
-            key = entry["test_step_definition"]
+            key = payload["test_step_definition"]
             self.checked_steps.pop(key, None)
-            self.step_sources.pop(key, None)   # <— ADD
+            self.step_sources.pop(key, None)
             return
 
-
-        def unmark_children(parent_id):
-            for child in self.tree.get_children(parent_id):
-                text = self.tree.item(child, "text")
-                ctype, cpayload = self.get_node_info(child)
-
-                if ctype == "method":
-                    entry = json.loads(cpayload)
-                    key = entry["test_step_definition"]
-                    self.checked_steps.pop(key, None)
-                    self.step_sources.pop(key, None)   # <— ADD
-
-
-                if text.startswith("☑"):
-                    clean = self._strip_checkbox(text)
-                    tags = list(self.tree.item(child, "tags"))
-                    if "checked_tag" in tags:
-                        tags.remove("checked_tag")
-                    self.tree.item(child, text=self._unchecked(clean), tags=tuple(tags))
-
-                unmark_children(child)
-
-        if node_type == "file":
-            folder_item_id = self.tree.parent(item_id)
-            folder_name = self._strip_all(self.tree.item(folder_item_id, "text"))
-            file_name = self._strip_all(self.tree.item(item_id, "text"))
-            entries = self.parse_python_file(folder_name, file_name, payload)
-            for e in entries:
-                self.checked_steps.pop(e["test_step_definition"], None)
-                self.step_sources.pop(e["test_step_definition"], None)   # <— ADD
-
-            unmark_children(item_id)
-
-            text = self.tree.item(item_id, "text")
-            if text.startswith("☑"):
-                clean = self._strip_checkbox(text)
-                tags = list(self.tree.item(item_id, "tags"))
-                if "checked_tag" in tags:
-                    tags.remove("checked_tag")
-                self.tree.item(item_id, text=self._unchecked(clean), tags=tuple(tags))
-
+        if node_type == "folder":
+            self._toggle_folder(item_id, False)
+            return
+        if node_type != "file":
             return
 
-        if node_type == "folder":
-            folder_name = self._strip_all(self.tree.item(item_id, "text"))
-            folder_path = payload
+        folder_name = self.nodes[self.tree.parent(item_id)].name
+        for e in self.parse_python_file(folder_name, self.nodes[item_id].name, payload):
+            self.checked_steps.pop(e["test_step_definition"], None)
+            self.step_sources.pop(e["test_step_definition"], None)
+        for child in self.tree.get_children(item_id):
+            self._set_checked(child, False)
+        self._set_checked(item_id, False)
 
-            entries = self.collect_folder_entries(folder_name, folder_path)
+    def _toggle_folder(self, item_id, checked):
+        """
+        Check/uncheck a folder and everything below it (sub folders included) in one pass:
+        every file is parsed once, the selection is updated from those entries, checking fills
+        the tree below the folder from the same entries, and the checkboxes are rendered last.
+        """
+        entries_by_file = self._folder_entries(self.nodes[item_id].path)
+        for entries in entries_by_file.values():
             for e in entries:
-                self.checked_steps.pop(e["test_step_definition"], None)
-                self.step_sources.pop(e["test_step_definition"], None)   # <— ADD
-
-
-            unmark_children(item_id)
+                if checked:
+                    self._add_entry(e)
+                else:
+                    self.checked_steps.pop(e["test_step_definition"], None)
+                    self.step_sources.pop(e["test_step_definition"], None)
+
+        changed = [item_id]
+        stack = [item_id]
+        while stack:
+            parent_id = stack.pop()
+            for node in self._pending_rows.get(parent_id, ()):
+                # rendered with this state once they are inserted
+                node.checked = checked
+            for child in self.tree.get_children(parent_id):
+                node = self.nodes[child]
+                if node.kind in ("dummy", "more"):
+                    continue
+                if checked and node.kind == "file":
+                    self.populate_file_methods(child, node.path, entries_by_file.get(node.path))
+                elif checked and node.kind == "folder":
+                    self._clear_dummy(child)
+                    self.populate_folder(child, node.path, entries_by_file)
+                changed.append(child)
+                stack.append(child)
 
-            text = self.tree.item(item_id, "text")
-            if text.startswith("☑"):
-                clean = self._strip_checkbox(text)
-                tags = list(self.tree.item(item_id, "tags"))
-                if "checked_tag" in tags:
-                    tags.remove("checked_tag")
-                self.tree.item(item_id, text=self._unchecked(clean), tags=tuple(tags))
+        for child in changed:
+            self._set_checked(child, checked)
 
     def _has_diagnosis_selection(self) -> bool:
         """
@@ -728,49 +958,93 @@ class TestStepTreeApp(ctk.CTk):
                 return True
         return False
 
-
     # preview / export ------------------------------------------
-
-    def _is_in_diagnosis_folder(self) -> bool:
+    def refresh_preview(self):
         """
-        Return True if the currently focused tree item is under the 'Diagnosis' folder.
+        Schedule a preview update, bursts of changes (e.g. a folder check) are rendered once.
         """
-        item_id = self.tree.focus()
-        if not item_id:
-            return False
-
-        # Walk up the tree to see if any parent is the 'Diagnosis' folder
-        while item_id:
-            text = self._strip_all(self.tree.item(item_id, "text"))
-            if text == "Diagnosis":
-                return True
-            item_id = self.tree.parent(item_id)
-
-        return False
+        self._update_status()
+        if self._preview_job is None:
+            self._preview_job = self.after(PREVIEW_DELAY, self._render_preview)
 
-    def refresh_preview(self):
-        self.preview.delete("1.0", "end")
-
-        steps = sorted(self.checked_steps.values(), key=lambda x: x["Test Step"])
+    def _render_preview(self):
+        """
+        Bring the preview in line with checked_steps, only removed and added blocks are touched.
+        """
+        self._preview_job = None
+        text = self.preview
+        old = self._preview_steps
+        # blocks whose description changed are removed and added again
+        dirty = self._preview_dirty
+        self._preview_dirty = set()
+
+        # removed steps, one delete per run of neighbouring blocks
+        kept = []
+        run_start = None
+        for step in old:
+            if step in self.checked_steps and step not in dirty:
+                if run_start is not None:
+                    text.delete(self._preview_marks[run_start], self._preview_marks[step])
+                    run_start = None
+                kept.append(step)
+            elif run_start is None:
+                run_start = step
+        if run_start is not None:
+            text.delete(self._preview_marks[run_start], "end-1c")
+        if len(kept) != len(old):
+            for step in old:
+                if step not in self.checked_steps or step in dirty:
+                    text.mark_unset(self._preview_marks.pop(step))
+
+        # added steps, one insert per run of blocks in front of the same kept block
+        added = sorted(self.checked_steps.keys() - self._preview_marks.keys())
+        runs = {}
+        for step in added:
+            runs.setdefault(bisect.bisect_right(kept, step), []).append(step)
+        for position, steps in runs.items():
+            index = text.index(self._preview_marks[kept[position]] if position < len(kept) else "end-1c")
+            line = int(index.split(".")[0])
+            blocks = []
+            for step in steps:
+                block = self._preview_block(step)
+                mark = f"step{self._mark_seq}"
+                self._mark_seq += 1
+                self._preview_marks[step] = mark
+                blocks.append((mark, line))
+                line += block.count("\n")
+            text.insert(index, "".join(self._preview_block(step) for step in steps))
+            for mark, line in blocks:
+                text.mark_set(mark, f"{line}.0")
+        if added:
+            kept = sorted(kept + added) if kept else added
+        self._preview_steps = kept
 
         # ✅ Show diagnosis info ONLY if at least one selected step is from Diagnosis
-        if self._has_diagnosis_selection():
-            diag_info = self._get_diag_description()
-            self.preview.insert("end", diag_info + "\n\n")
-
-        for e in steps:
-            self.preview.insert("end", f"{e['Test Step']}\n")
-            desc = e["Description"] or "-"
-
-            pretty = desc
-            pretty = pretty.replace(" @param", "\n        @param")
-            pretty = pretty.replace(" @return", "\n        @return")
-            pretty = pretty.replace(" Example:", "\n        Example:")
+        header = self._get_diag_description() + "\n\n" if self._has_diagnosis_selection() else ""
+        if header != self._preview_header:
+            if self._preview_header:
+                text.delete("1.0", f"1.0 + {len(self._preview_header)} chars")
+            if header:
+                text.insert("1.0", header)
+            self._preview_header = header
+
+    def _preview_block(self, step):
+        """
+        Preview text of one step, formatted once per description.
+        """
+        desc = self.checked_steps[step]["Description"] or "-"
+        cached = self._block_cache.get(step)
+        if cached and cached[0] == desc:
+            return cached[1]
 
-            self.preview.insert("end", "    Description:\n")
-            self.preview.insert("end", f"        {pretty.strip()}\n\n")
+        pretty = desc
+        pretty = pretty.replace(" @param", "\n        @param")
+        pretty = pretty.replace(" @return", "\n        @return")
+        pretty = pretty.replace(" Example:", "\n        Example:")
 
-        self.status_label.configure(text=f"{len(steps)} steps selected")
+        block = f"{step}\n    Description:\n        {pretty.strip()}\n\n"
+        self._block_cache[step] = (desc, block)
+        return block
 
     def export_json(self):
         steps = sorted(self.checked_steps.values(), key=lambda x: x["Test Step"])
@@ -800,27 +1074,116 @@ class TestStepTreeApp(ctk.CTk):
     def _unchecked(self, text: str) -> str:
         return f"☐ {text}"
 
-    def _strip_checkbox(self, text: str) -> str:
-        if text.startswith("☑ "):
-            return text[2:].strip()
-        if text.startswith("☐ "):
-            return text[2:].strip()
-        return text
+    def _node_text(self, node):
+        if node.kind == "dummy":
+            return node.label
+        return self._checked(node.label) if node.checked else self._unchecked(node.label)
+
+    def _insert_node(self, parent_id, node, open=False, index="end"):
+        tags = (node.tag, "checked_tag") if node.checked else (node.tag,)
+        item_id = self.tree.insert(parent_id, index, text=self._node_text(node), open=open, tags=tags)
+        self.nodes[item_id] = node
+        return item_id
+
+    def _insert_dummy(self, parent_id, label="..."):
+        return self._insert_node(parent_id, TreeNode("dummy", label))
+
+    def _insert_row(self, parent_id, node, index="end"):
+        # rows inserted after their parent was toggled (batched, paged or expanded later) take
+        # the state of the parent and of the selection
+        parent = self.nodes.get(parent_id)
+        parent_checked = parent is not None and parent.kind == "folder" and parent.checked
+        if node.kind == "method":
+            node.checked = node.entry["test_step_definition"] in self.checked_steps
+        elif node.kind == "folder":
+            node.checked = node.checked or parent_checked
+        elif node.kind == "file":
+            steps = self._file_steps.get(node.path)
+            node.checked = node.checked or parent_checked or (
+                bool(steps) and all(step in self.checked_steps for step in steps)
+            )
+        item_id = self._insert_node(parent_id, node, index=index)
+        if node.kind in ("folder", "file"):
+            self._insert_dummy(item_id)
+        return item_id
 
-    def _strip_emoji(self, text: str) -> str:
-        for emoji in ("🧱", "📁", "📄", "⚙️", "❗", "🛠️"):
-            if text.startswith(emoji + " "):
-                return text[len(emoji) + 1:].strip()
-        return text
+    def _insert_nodes(self, parent_id, nodes):
+        """
+        Add child nodes without blocking the GUI: the first INSERT_BATCH rows right away, the rest
+        from the event loop. Above VIRTUAL_LIMIT children only VIRTUAL_PAGE rows are materialized,
+        the next page follows when the '⋯ more' row scrolls into view or is clicked.
+        """
+        self._pending_rows[parent_id] = deque(nodes)
+        if len(nodes) > VIRTUAL_LIMIT:
+            self._materialize_page(parent_id)
+        else:
+            self._insert_batch(parent_id)
 
-    def _strip_all(self, text: str) -> str:
-        return self._strip_emoji(self._strip_checkbox(text))
+    def _insert_batch(self, parent_id):
+        pending = self._pending_rows.get(parent_id)
+        if pending is None:
+            return
+        for _ in range(min(INSERT_BATCH, len(pending))):
+            self._insert_row(parent_id, pending.popleft())
+        if pending:
+            self.after(1, self._insert_batch, parent_id)
+        else:
+            del self._pending_rows[parent_id]
+
+    def _materialize_page(self, parent_id):
+        pending = self._pending_rows.get(parent_id)
+        if pending is None:
+            return
+        more_id = self._more_rows.pop(parent_id, None)
+        if more_id:
+            self._delete_item(more_id)
+        for _ in range(min(VIRTUAL_PAGE, len(pending))):
+            self._insert_row(parent_id, pending.popleft())
+        if pending:
+            # the path of a 'more' row is the item it belongs to
+            self._more_rows[parent_id] = self._insert_node(
+                parent_id, TreeNode("more", f"⋯ {len(pending)} more", path=parent_id, tag="info_tag")
+            )
+        else:
+            del self._pending_rows[parent_id]
+
+    def _on_tree_scroll(self, first, last):
+        self.yscroll.set(first, last)
+        if self._more_rows and self._scroll_check is None:
+            self._scroll_check = self.after_idle(self._materialize_visible)
+
+    def _materialize_visible(self):
+        self._scroll_check = None
+        for parent_id, more_id in list(self._more_rows.items()):
+            # bbox is empty while the row is scrolled out or its parent is collapsed
+            if self.tree.exists(more_id) and self.tree.bbox(more_id):
+                self._materialize_page(parent_id)
+
+    def _delete_item(self, item_id):
+        stack = [item_id]
+        while stack:
+            child = stack.pop()
+            node = self.nodes.pop(child, None)
+            if node is not None and node.kind == "more" and self._more_rows.get(node.path) == child:
+                del self._more_rows[node.path]
+            self._pending_rows.pop(child, None)
+            self._more_rows.pop(child, None)
+            stack.extend(self.tree.get_children(child))
+        self.tree.delete(item_id)
+
+    def _set_checked(self, item_id, checked):
+        node = self.nodes[item_id]
+        if node.checked == checked:
+            return
+        node.checked = checked
+        tags = (node.tag, "checked_tag") if checked else (node.tag,)
+        self.tree.item(item_id, text=self._node_text(node), tags=tags)
 
     def get_node_info(self, item_id):
-        vals = self.tree.item(item_id, "values")
-        if not vals:
+        node = self.nodes.get(item_id)
+        if node is None:
             return None, None
-        return vals[0], vals[1]
+        return node.kind, node.payload
 
     # add entry ----------------------------------------------
     def _add_entry(self, entry_dict):
@@ -851,265 +1214,23 @@ class TestStepTreeApp(ctk.CTk):
         self.step_sources[step] = entry_dict.get("source_path", "")
 
     # parsing -------------------------------------------------
-    def collect_folder_entries(self, folder_name, folder_path):
-        all_entries = []
-        for fname in sorted(os.listdir(folder_path)):
-            if not fname.endswith(".py") or fname.startswith("__init__"):
-                continue
-            fpath = os.path.join(folder_path, fname)
-            entries = self.parse_python_file(folder_name, fname, fpath)
-            all_entries.extend(entries)
-        return all_entries
-
-    def parse_python_file(self, folder, file_name, path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                src = f.read()
-        except Exception:
-            return []
-
-        try:
-            tree = ast.parse(src)
-        except SyntaxError:
-            return []
-
-        tal_imports = {}
-        proj_imports = {}
-        util_imports = {}  # <— add
-
-        for node in tree.body:
-            if isinstance(node, ast.ImportFrom) and node.module:
-                if node.module.startswith("tal"):
-                    for alias in node.names:
-                        tal_imports[alias.asname or alias.name] = (node.module, alias.name)
-                elif node.module.startswith("ProjectComponents."):
-                    for alias in node.names:
-                        proj_imports[alias.asname or alias.name] = (node.module, alias.name)
-                elif node.module.startswith("Utility."):  # <— NEW
-                    for alias in node.names:
-                        util_imports[alias.asname or alias.name] = (node.module, alias.name)
-
-
-        results = []
-        module = os.path.splitext(file_name)[0]
-
-        for node in tree.body:
-            if isinstance(node, ast.FunctionDef):
-                # keep only CamelCase / PascalCase style
-                if self._is_dunder(node.name):
-                    continue
-                if not self._is_camel_step(node.name):
-                    continue
-                results.append(self._entry(folder, module, node, path))
-            elif isinstance(node, ast.ClassDef):
-                for func in node.body:
-                    if isinstance(func, ast.FunctionDef) and not self._is_dunder(func.name):
-                        if not self._is_camel_step(func.name):
-                            continue
-                        results.append(self._entry(folder, module, func, path))
-
-                # inside: for node in tree.body: if isinstance(node, ast.ClassDef):
-                for base in node.bases:
-                    if isinstance(base, ast.Name):
-                        bname = base.id
-                        if bname in tal_imports:
-                            mod, cls = tal_imports[bname]
-                            results.extend(self._load_tal_class_methods_recursive(mod, cls, folder, module, visited=set()))
-                        elif bname in proj_imports:
-                            mod, cls = proj_imports[bname]
-                            results.extend(self._load_project_class_methods_recursive(mod, cls, folder, module, visited=set()))
-                        elif bname in util_imports:
-                            mod, cls = util_imports[bname]
-                            results.extend(self._load_utility_class_methods_recursive(mod, cls, folder, module, visited=set()))
-                        elif bname == "DiagnosisInterface":  # <<< special-case
-                            resolved = self._resolve_diag_impl_from_cfg()
-                            if resolved:
-                                mod, cls = resolved  # ('tal.FunctionalComponents.Diagnosis.DiagnosisInterface', 'UdsSymbolic', ...)
-                                results.extend(
-                                    self._load_tal_class_methods_recursive(
-                                        mod, cls, folder, module, visited=set()
-                                    )
-                                )
-
-
-
-        return results
-
-    def _load_utility_class_methods_recursive(self, module_name, class_name, folder, module, visited):
+    def _folder_entries(self, folder_path):
         """
-        Resolve Utility.* modules to file paths under the workspace root and load methods recursively.
-        Example module_name: 'Utility.SupportingScripts.ParallelTestSteps.ParallelExecution'
+        {file path: entries} of every file below a folder, each file parsed once.
         """
-        if not self.workspace_root:
-            return []
-
-        # Map module path to file path under the workspace root
-        rel = module_name.replace(".", os.sep) + ".py"  # Utility/SupportingScripts/.../ParallelExecution.py
-        file_path = os.path.join(self.workspace_root, rel)
-        return self._load_class_methods_recursive(file_path, class_name, folder, module, visited)
-
-
-    def _load_tal_class_methods_recursive(self, module_name, class_name, folder, module, visited):
-        if module_name.startswith("tal."):
-            rel = module_name[len("tal."):].replace(".", os.sep) + ".py"
-        elif module_name == "tal":
-            rel = class_name + ".py"
-        else:
-            rel = module_name.replace(".", os.sep) + ".py"
-        file_path = os.path.join(EXTRA_LIB_ROOT, rel)
-        return self._load_class_methods_recursive(file_path, class_name, folder, module, visited)
-
-    def _load_project_class_methods_recursive(self, module_name, class_name, folder, module, visited):
-        if not self.project_root:
-            return []
-        rel = module_name[len("ProjectComponents.") :].replace(".", os.sep) + ".py"
-        file_path = os.path.join(self.project_root, rel)
-        return self._load_class_methods_recursive(file_path, class_name, folder, module, visited)
-
-    def _load_class_methods_recursive(self, file_path, class_name, folder, module, visited):
-        key = (os.path.abspath(file_path), class_name)
-        if key in visited:
-            return []
-        visited.add(key)
-
-        if not os.path.isfile(file_path):
-            return []
-
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                src = f.read()
-        except Exception:
-            return []
-
-        try:
-            tree = ast.parse(src)
-        except SyntaxError:
-            return []
-
-        tal_imports = {}
-        proj_imports = {}
-        util_imports = {}   # <<< REQUIRED
-
-        for node in tree.body:
-            if isinstance(node, ast.ImportFrom) and node.module:
-                if node.module.startswith("tal"):
-                    for alias in node.names:
-                        tal_imports[alias.asname or alias.name] = (node.module, alias.name)
-                elif node.module.startswith("ProjectComponents."):
-                    for alias in node.names:
-                        proj_imports[alias.asname or alias.name] = (node.module, alias.name)
-
-        results = []
-        for node in tree.body:
-            if isinstance(node, ast.ClassDef) and node.name == class_name:
-                for func in node.body:
-                    if isinstance(func, ast.FunctionDef) and not self._is_dunder(func.name):
-                        if not self._is_camel_step(func.name):
-                            continue
-                        params = self._param_string(func)
-                        # ⬇️ remove folder from here too
-                        full = f"{module}.{func.name}{params}"
-                        doc = ast.get_docstring(func) or ""
-                        results.append(
-                            {
-                                "test_step_definition": full,
-                                "test_step_description": doc,
-                                "source_path": file_path,
-                            }
-                        )
-                # after building tal_imports / proj_imports / util_imports
-                for base in node.bases:
-                    if isinstance(base, ast.Name):
-                        bname = base.id
-                        if bname in tal_imports:
-                            mod, cls = tal_imports[bname]
-                            results.extend(self._load_tal_class_methods_recursive(mod, cls, folder, module, visited))
-                        elif bname in proj_imports:
-                            mod, cls = proj_imports[bname]
-                            results.extend(self._load_project_class_methods_recursive(mod, cls, folder, module, visited))
-                        elif bname in util_imports:
-                            mod, cls = util_imports[bname]
-                            results.extend(self._load_utility_class_methods_recursive(mod, cls, folder, module, visited))
-                        elif bname == "DiagnosisInterface":  # <<< special-case
-                            resolved = self._resolve_diag_impl_from_cfg()
-                            if resolved:
-                                mod, cls = resolved
-                                results.extend(
-                                    self._load_tal_class_methods_recursive(
-                                        mod, cls, folder, module, visited
-                                    )
-                                )
-
-
-        return results
-
-    def _entry(self, folder, module, node, source_path):
-        doc = ast.get_docstring(node) or ""
-        params = self._param_string(node)
-        # ⬇️ here we remove the folder from the final name
-        full = f"{module}.{node.name}{params}"
         return {
-            "test_step_definition": full,
-            "test_step_description": doc,
-            "source_path": source_path,
+            path: self.parse_python_file(os.path.basename(os.path.dirname(path)), os.path.basename(path), path)
+            for path in python_files(folder_path)
         }
 
-    def _is_dunder(self, name):
-        return name.startswith("__") and name.endswith("__")
-
-    def _param_string(self, node):
-        args = node.args
-        parts = []
-
-        pos_args = args.args[:]
-        if pos_args and pos_args[0].arg in ("self", "cls"):
-            pos_args = pos_args[1:]
-
-        defaults = args.defaults or []
-        num_pos = len(pos_args)
-        num_def = len(defaults)
-
-        for i, arg in enumerate(pos_args):
-            name = arg.arg
-            default_str = None
-            if i >= num_pos - num_def:
-                default_node = defaults[i - (num_pos - num_def)]
-                default_str = self._expr_to_str(default_node)
-            if default_str:
-                parts.append(f"{name}={default_str}")
-            else:
-                parts.append(name)
-
-        if args.vararg:
-            parts.append(f"*{args.vararg.arg}")
-
-        for kwarg, default in zip(args.kwonlyargs, args.kw_defaults):
-            name = kwarg.arg
-            if default is not None:
-                parts.append(f"{name}={self._expr_to_str(default)}")
-            else:
-                parts.append(name)
-
-        if args.kwarg:
-            parts.append(f"**{args.kwarg.arg}")
-
-        return "(" + ", ".join(parts) + ")"
-
-    def _expr_to_str(self, node):
-        if not node:
-            return ""
-        try:
-            if hasattr(ast, "unparse"):
-                return ast.unparse(node)
-        except Exception:
-            pass
-        if isinstance(node, ast.Constant):
-            return repr(node.value)
-        if isinstance(node, ast.Name):
-            return node.id
-        if isinstance(node, ast.Attribute):
-            return f"{self._expr_to_str(node.value)}.{node.attr}"
-        return "<expr>"
+    def parse_python_file(self, folder, file_name, path):
+        """
+        Steps of a file (own and inherited), served from the parse cache.
+        """
+        entries = self.catalog.file_entries(folder, file_name, path)
+        # what the tree and the selection know about this file, see _files_changed
+        self._file_steps[path] = [e["test_step_definition"] for e in entries]
+        return entries
 
 
 if __name__ == "__main__":